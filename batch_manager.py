@@ -0,0 +1,190 @@
+"""Module containing NumPy utilities for evaluating large batches of hands given as arrays of card ids."""
+
+import numpy as np
+from itertools import combinations_with_replacement
+import cards_manager
+from cards_manager import Card
+
+_PRIME_ARRAY = np.array(cards_manager._PRIMES[2:], dtype=np.int64)
+_FLUSH_ARRAY = np.array(cards_manager._FLUSH_LOOKUP, dtype=np.int32)
+_MULTISET_TABLES: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+def _multiset_table(n_cards: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Builds (once per hand size) the table of the best non-flush strength of every rank multiset, keyed by the product of the rank primes.
+
+    Args:
+        n_cards (int): The number of cards in each hand, between 5 and 7.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The sorted prime products and the strength of each, on the same scale as cards_manager.evaluate5.
+    """
+    if n_cards not in _MULTISET_TABLES:
+        table = {}
+        for values in combinations_with_replacement(range(2, 15), n_cards):
+            if any(values.count(value) > 4 for value in set(values)): continue
+            # Cycling the suits keeps every suit below five cards, so the hand cannot be a flush.
+            cards = [Card(i % 4 + 1, value) for i, value in enumerate(values)]
+            table[int(np.prod(_PRIME_ARRAY[[value - 2 for value in values]]))] = cards_manager._evaluate_best(cards)
+        keys = np.array(sorted(table), dtype=np.int64)
+        _MULTISET_TABLES[n_cards] = keys, np.array([table[key] for key in keys.tolist()], dtype=np.int32)
+    return _MULTISET_TABLES[n_cards]
+
+def cards_to_ids(hands: list[list[Card]]) -> np.ndarray:
+    """
+    Converts a list of hands into an array of card ids.
+
+    Args:
+        hands (list[list[Card]]): The hands to convert, which must all be the same length.
+
+    Raises:
+        ValueError: If the hands are not all the same length.
+
+    Returns:
+        np.ndarray: An int8 array of shape (number of hands, hand length).
+    """
+    if not hands: return np.empty((0, 0), dtype=np.int8)
+    hand_length = len(hands[0])
+    if any(len(hand) != hand_length for hand in hands): raise ValueError("All hands must be the same length.")
+    ids = np.fromiter((card.id for hand in hands for card in hand), dtype=np.int8, count=len(hands) * hand_length)
+    return ids.reshape(len(hands), hand_length)
+
+def ids_to_cards(card_ids: np.ndarray) -> list[list[Card]]:
+    """
+    Converts an array of card ids back into a list of hands.
+
+    Args:
+        card_ids (np.ndarray): An array of card ids of shape (number of hands, hand length).
+
+    Returns:
+        list[list[Card]]: The hands as lists of Card objects.
+    """
+    return [[cards_manager._CARDS[card_id] for card_id in row] for row in np.asarray(card_ids).tolist()]
+
+def evaluate_batch(card_ids: np.ndarray, chunk_size: int = 1 << 20) -> np.ndarray:
+    """
+    Evaluates the best five-card hand of every row in an array of card ids, using vectorized table lookups.
+
+    Args:
+        card_ids (np.ndarray): An array of card ids (0 to 51, see Card.id) of shape (number of hands, 5 to 7), with unique ids in each row.
+        chunk_size (int, optional): The number of rows evaluated at once, bounding the memory used by intermediate arrays. Defaults to 1048576.
+
+    Raises:
+        ValueError: If the array has the wrong shape, contains invalid card ids or a row contains duplicate cards.
+
+    Returns:
+        np.ndarray: An int32 array holding the strength of each hand between 1 and 7462, matching the 'value' of cards_manager.rank_hand.
+    """
+    card_ids = np.asarray(card_ids)
+    if card_ids.ndim != 2 or card_ids.shape[1] not in range(5, 8): raise ValueError("Card ids must have a shape of (number of hands, 5 to 7).")
+    if card_ids.size and (card_ids.min() < 0 or card_ids.max() > 51): raise ValueError("Card ids must be between 0 and 51.")
+
+    keys, values = _multiset_table(card_ids.shape[1])
+    strengths = np.empty(len(card_ids), dtype=np.int32)
+
+    for start in range(0, len(card_ids), chunk_size):
+        chunk = card_ids[start:start + chunk_size].astype(np.int64)
+        card_masks = np.left_shift(np.int64(1), chunk)
+        masks = np.bitwise_or.reduce(card_masks, axis=1)
+        # Distinct cards are distinct powers of two, so the sum only differs from the bitwise or when a card repeats.
+        if np.any(card_masks.sum(axis=1) != masks): raise ValueError("Each hand must contain only unique cards.")
+
+        flush_strengths = _FLUSH_ARRAY[masks & 0x1FFF]
+        for shift in (13, 26, 39):
+            np.maximum(flush_strengths, _FLUSH_ARRAY[(masks >> shift) & 0x1FFF], out=flush_strengths)
+
+        rank_strengths = values[np.searchsorted(keys, _PRIME_ARRAY[chunk % 13].prod(axis=1))]
+        strengths[start:start + chunk_size] = np.where(flush_strengths > 0, flush_strengths, rank_strengths)
+
+    return strengths
+
+def evaluate_hands(hands: list[list[Card]]) -> np.ndarray:
+    """
+    Evaluates a list of hands of Card objects in one batch.
+
+    Args:
+        hands (list[list[Card]]): The hands to evaluate, which must all hold the same amount of cards (5 to 7).
+
+    Returns:
+        np.ndarray: An int32 array holding the strength of each hand, matching the 'value' of cards_manager.rank_hand.
+    """
+    return evaluate_batch(cards_to_ids(hands))
+
+def deal_batch(dead_cards: list[Card], n_samples: int, n_opponents: int = 1, board_needed: int = 5, rng: np.random.Generator = None, chunk_size: int = 1 << 18) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Deals many independent random completions at once, each sampled without replacement from the cards that are not dead.
+    Every row is dealt with a vectorized partial Fisher-Yates shuffle, so only the dealt positions are shuffled.
+
+    Args:
+        dead_cards (list[Card]): The cards that cannot be dealt, such as known hole cards and board cards.
+        n_samples (int): The number of completions to deal.
+        n_opponents (int, optional): The number of opponents to deal 2 hole cards to. Defaults to 1.
+        board_needed (int, optional): The number of board cards to deal. Defaults to 5.
+        rng (np.random.Generator, optional): The random generator to use, for reproducible deals. Defaults to None, creating a new unseeded generator.
+        chunk_size (int, optional): The number of rows shuffled at once, bounding the memory used. Defaults to 262144.
+
+    Raises:
+        ValueError: If the amounts are negative or more cards are needed than remain.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The board cards of shape (n_samples, board_needed) and the opponent hole cards of shape (n_samples, n_opponents, 2), as int8 card ids.
+    """
+    if n_samples < 0 or n_opponents < 0 or board_needed < 0: raise ValueError("The amount of samples, opponents and board cards cannot be negative.")
+    rng = np.random.default_rng() if rng is None else rng
+    dead_mask = cards_manager.cards_to_mask(dead_cards)
+    available = np.array([card_id for card_id in range(52) if not dead_mask >> card_id & 1], dtype=np.int8)
+    dealt_amount = board_needed + 2 * n_opponents
+    if dealt_amount > len(available): raise ValueError("Not enough cards left to deal.")
+
+    dealt = np.empty((n_samples, dealt_amount), dtype=np.int8)
+    for start in range(0, n_samples, chunk_size):
+        rows = min(chunk_size, n_samples - start)
+        row_index = np.arange(rows)
+        deck = np.tile(available, (rows, 1))
+        for i in range(dealt_amount):
+            j = rng.integers(i, len(available), size=rows)
+            picked = deck[row_index, j]
+            deck[row_index, j] = deck[:, i]
+            deck[:, i] = picked
+        dealt[start:start + rows] = deck[:, :dealt_amount]
+
+    return dealt[:, :board_needed], dealt[:, board_needed:].reshape(n_samples, n_opponents, 2)
+
+def equity_batch(hole_cards: list[Card], board_cards: list[Card] = None, n_opponents: int = 1, n_samples: int = 100000, rng: np.random.Generator = None) -> dict[str, any]:
+    """
+    Estimates the equity of a pair of hole cards against unknown opponents by dealing and evaluating all samples as arrays.
+
+    Args:
+        hole_cards (list[Card]): The 2 hole cards of the hand.
+        board_cards (list[Card], optional): The 0 to 5 board cards already dealt. Defaults to None, meaning no board cards.
+        n_opponents (int, optional): The number of opponents. Defaults to 1.
+        n_samples (int, optional): The number of samples. Defaults to 100000.
+        rng (np.random.Generator, optional): The random generator to use, for reproducible results. Defaults to None, creating a new unseeded generator.
+
+    Raises:
+        ValueError: If the amount of hole cards, board cards, opponents or samples is invalid, or duplicate cards appear.
+
+    Returns:
+        dict: A dictionary containing keys 'equity', 'win', 'tie', 'loss', 'samples' and 'std_error', as in cards_manager.equity.
+    """
+    board_cards = [] if board_cards is None else list(board_cards)
+    if len(hole_cards) != 2: raise ValueError("There must be exactly 2 hole cards.")
+    if len(board_cards) > 5: raise ValueError("There cannot be more than 5 board cards.")
+    if n_opponents < 1: raise ValueError("There must be at least 1 opponent.")
+    if n_samples < 1: raise ValueError("There must be at least 1 sample.")
+    if len(set(hole_cards + board_cards)) != len(hole_cards) + len(board_cards): raise ValueError("The hand must contain only unique cards.")
+
+    boards, opponents = deal_batch(hole_cards + board_cards, n_samples, n_opponents, 5 - len(board_cards), rng)
+    known_board = np.tile(np.array([card.id for card in board_cards], dtype=np.int8), (n_samples, 1))
+    full_boards = np.concatenate([known_board, boards], axis=1)
+    hole_ids = np.tile(np.array([card.id for card in hole_cards], dtype=np.int8), (n_samples, 1))
+
+    hero_values = evaluate_batch(np.concatenate([hole_ids, full_boards], axis=1))
+    opponent_values = np.stack([evaluate_batch(np.concatenate([opponents[:, i], full_boards], axis=1)) for i in range(n_opponents)], axis=1)
+    best_opponent = opponent_values.max(axis=1)
+    tied_opponents = (opponent_values == best_opponent[:, None]).sum(axis=1)
+
+    wins, ties = hero_values > best_opponent, hero_values == best_opponent
+    shares = np.where(wins, 1.0, np.where(ties, 1 / (tied_opponents + 1), 0.0))
+    std_error = float(shares.std(ddof=1) / np.sqrt(n_samples)) if n_samples > 1 else float("inf")
+    return {"equity": float(shares.mean()), "win": float(wins.mean()), "tie": float(ties.mean()), "loss": float(1 - wins.mean() - ties.mean()), "samples": n_samples, "std_error": std_error}
@@ -0,0 +1,164 @@
+"""
+Module containing constant-time lookups of card-abstraction buckets, from the tables written by generate_bucket_tables.py.
+
+A table covers one street. It holds a header, the sorted keys of the street's suit-isomorphic canonical boards as little-endian uint64, then one byte per board and pair of hole cards giving the bucket (NO_BUCKET for hole cards that overlap the board).
+Buckets are ordered by strength, so bucket 0 holds the weakest holdings.
+"""
+
+import os, sys, mmap, struct
+from array import array
+from cards_manager import Card
+
+BUCKET_TABLE_MAGIC = b"PKBK"
+BUCKET_TABLE_HEADER = struct.Struct("<4sHBHI")
+BUCKET_TABLE_DIR = os.path.dirname(os.path.abspath(__file__))
+STREETS = {0: "preflop", 3: "flop", 4: "turn", 5: "river"}
+HOLE_PAIRS = 52 * 51 // 2
+NO_BUCKET = 255
+
+def bucket_table_path(board_size: int) -> str:
+    """
+    Returns the default path of the table of a street.
+
+    Args:
+        board_size (int): The number of board cards of the street (0, 3, 4 or 5).
+
+    Raises:
+        ValueError: If the number of board cards is not that of a street.
+
+    Returns:
+        str: The path, e.g. 'buckets_flop.bin' next to this module.
+    """
+    if board_size not in STREETS: raise ValueError("The number of board cards must be 0, 3, 4 or 5.")
+    return os.path.join(BUCKET_TABLE_DIR, f"buckets_{STREETS[board_size]}.bin")
+
+def pair_index(first_id: int, second_id: int) -> int:
+    """
+    Finds the index of a pair of card ids among all 1326 pairs.
+
+    Args:
+        first_id (int): The id of one card.
+        second_id (int): The id of the other card.
+
+    Returns:
+        int: The index of the pair, between 0 and 1325.
+    """
+    low, high = (first_id, second_id) if first_id < second_id else (second_id, first_id)
+    return high * (high - 1) // 2 + low
+
+def canonical_index(hole_cards: list[Card], board_cards: list[Card]) -> tuple[int, int]:
+    """
+    Relabels the suits of a holding into its suit-isomorphic canonical form, so that every suit permutation of the holding shares one table entry.
+    Suits are ordered by their board cards and then by their hole cards, so the canonical board only depends on the board.
+
+    Args:
+        hole_cards (list[Card]): The 2 hole cards.
+        board_cards (list[Card]): The board cards.
+
+    Returns:
+        tuple[int, int]: The key of the canonical board (the rank bitmask of each canonical suit, 13 bits per suit) and the pair index of the canonical hole cards.
+    """
+    board_masks, hole_masks = [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]
+    for card in board_cards:
+        board_masks[card.suit] |= 1 << (card.value - 2)
+    for card in hole_cards:
+        hole_masks[card.suit] |= 1 << (card.value - 2)
+
+    order = sorted((1, 2, 3, 4), key=lambda suit: (board_masks[suit], hole_masks[suit]), reverse=True)
+    to_canonical = [0, 0, 0, 0, 0]
+    board_key = 0
+    for position, suit in enumerate(order):
+        to_canonical[suit] = position
+        board_key |= board_masks[suit] << (13 * position)
+
+    first, second = hole_cards
+    return board_key, pair_index(to_canonical[first.suit] * 13 + first.value - 2, to_canonical[second.suit] * 13 + second.value - 2)
+
+class BucketTable:
+    """A memory-mapped bucket table of one street."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens a table and indexes its boards.
+
+        Args:
+            path (str): The path of the table.
+
+        Raises:
+            ValueError: If the file is not a valid bucket table.
+        """
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < BUCKET_TABLE_HEADER.size: raise ValueError("The file is not a valid bucket table.")
+        magic, version, self.board_size, self.n_buckets, n_boards = BUCKET_TABLE_HEADER.unpack_from(self._mmap, 0)
+        keys_size = 8 * n_boards
+        if magic != BUCKET_TABLE_MAGIC or version != 1 or len(self._mmap) != BUCKET_TABLE_HEADER.size + keys_size + n_boards * HOLE_PAIRS:
+            raise ValueError("The file is not a valid bucket table.")
+
+        keys = array("Q")
+        keys.frombytes(self._mmap[BUCKET_TABLE_HEADER.size:BUCKET_TABLE_HEADER.size + keys_size])
+        if sys.byteorder == "big": keys.byteswap()
+        self._rows = {key: row for row, key in enumerate(keys)}
+        self._offset = BUCKET_TABLE_HEADER.size + keys_size
+
+    def lookup(self, board_key: int, pair: int) -> int:
+        """
+        Reads the bucket of a canonical holding.
+
+        Args:
+            board_key (int): The key of the canonical board, as returned by canonical_index.
+            pair (int): The pair index of the canonical hole cards.
+
+        Returns:
+            int: The bucket, or NO_BUCKET if the hole cards overlap the board.
+        """
+        return self._mmap[self._offset + self._rows[board_key] * HOLE_PAIRS + pair]
+
+    def close(self) -> None:
+        """Unmaps the table."""
+        self._mmap.close()
+
+_tables: dict[int, BucketTable] = {}
+
+def load_bucket_table(path: str) -> BucketTable:
+    """
+    Loads a bucket table, replacing the loaded table of the same street.
+
+    Args:
+        path (str): The path of the table.
+
+    Raises:
+        ValueError: If the file is not a valid bucket table.
+
+    Returns:
+        BucketTable: The loaded table.
+    """
+    table = BucketTable(path)
+    previous = _tables.get(table.board_size)
+    _tables[table.board_size] = table
+    if previous is not None: previous.close()
+    return table
+
+def bucket(hole_cards: list[Card], board_cards: list[Card] = None) -> int:
+    """
+    Looks up the strength bucket of a holding in constant time. The table of the street is loaded from bucket_table_path on first use, unless one was loaded with load_bucket_table.
+
+    Args:
+        hole_cards (list[Card]): The 2 hole cards.
+        board_cards (list[Card], optional): The 0, 3, 4 or 5 board cards. Defaults to None, meaning no board cards.
+
+    Raises:
+        ValueError: If the cards are invalid or overlap.
+        FileNotFoundError: If the table of the street has not been generated.
+
+    Returns:
+        int: The bucket, between 0 (weakest) and the table's n_buckets - 1 (strongest).
+    """
+    board_cards = [] if board_cards is None else board_cards
+    if len(hole_cards) != 2: raise ValueError("There must be exactly 2 hole cards.")
+    if len(board_cards) not in STREETS: raise ValueError("The number of board cards must be 0, 3, 4 or 5.")
+    if len(set(hole_cards) | set(board_cards)) != 2 + len(board_cards): raise ValueError("The hand must contain only unique cards.")
+
+    table = _tables.get(len(board_cards))
+    if table is None: table = load_bucket_table(bucket_table_path(len(board_cards)))
+    return table.lookup(*canonical_index(hole_cards, board_cards))
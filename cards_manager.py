@@ -1,18 +1,26 @@
 """Module containing utility functions for managing cards, decks, and ranking hands (including possibilites)."""
 
-import random, math
-from copy import deepcopy
-from collections import Counter
-from itertools import combinations
+import random, math, time, threading, os, mmap, struct
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from itertools import combinations, combinations_with_replacement
+from typing import Iterator
+import metrics_manager
 
 class Card:
-    """Represents a single playing card with suit and value."""
+    """
+    Represents a single playing card with suit and value. 
+    Only 52 Card objects ever exist: constructing a card returns the shared instance for that suit and value, so cards must not be modified.
+    Each card carries an id between 0 and 51 (ordered by suit, then value) and a bitmask of 1 << id, so sets of cards can be represented as a single int.
+    """
+    __slots__ = ("suit", "value", "id", "mask")
     suits = {1: 'Spades', 2: 'Hearts', 3: 'Diamonds', 4: 'Clubs'}
     values = {11: 'Jack', 12: 'Queen', 13: 'King', 14: 'Ace', **{v: str(v) for v in range(2, 11)}}
+    _interned: dict[tuple[int, int], "Card"] = {}
 
-    def __init__(self, suit: int, value: int) -> None:
+    def __new__(cls, suit: int, value: int) -> "Card":
         """
-        Initializes a card with the specified suit and value.
+        Returns the card with the specified suit and value.
         
         Args:
             suit (int): The suit of the card, must be between 1 and 4. Spades = 1, Hearts = 2, Diamonds = 3, Clubs = 4
@@ -21,54 +29,194 @@ class Card:
         Raises:
             ValueError: If suit or value are out of the valid range.
         """
+        card = cls._interned.get((suit, value))
+        if card is not None: return card
         if suit not in range(1, 5): raise ValueError("Suit is not in range of 1-4.")
         if value not in range(2, 15): raise ValueError("Value is not in range of 2-14.")
-        self.suit = suit
-        self.value = value
+        
+        card = super().__new__(cls)
+        card.suit = suit
+        card.value = value
+        card.id = (suit - 1) * 13 + (value - 2)
+        card.mask = 1 << card.id
+        cls._interned[(suit, value)] = card
+        return card
 
     def __repr__(self) -> str:
         return f'{Card.values[self.value]} of {Card.suits[self.suit]}'
     
     def __eq__(self, other) -> bool:
-        return self.suit == other.suit and self.value == other.value
+        if not isinstance(other, Card): return NotImplemented
+        return self.id == other.id
 
     def __hash__(self) -> int:
-        return hash((self.suit, self.value))
+        return self.id
+    
+    def __reduce__(self) -> tuple:
+        return Card, (self.suit, self.value)
+    
+    def __copy__(self) -> "Card":
+        return self
+    
+    def __deepcopy__(self, memo: dict) -> "Card":
+        return self
+
+_CARDS = [Card(suit, value) for suit in range(1, 5) for value in range(2, 15)]
+_ORDERED_IDS = tuple(range(52))
+FULL_DECK_MASK = (1 << 52) - 1
+
+def cards_to_mask(cards: list[Card]) -> int:
+    """
+    Converts a list of cards into a single int bitmask.
+    
+    Args:
+        cards (list[Card]): The Card objects to convert. Duplicates are only counted once.
+        
+    Returns:
+        int: The bitmask of the cards, with bit n set for the card with id n.
+    """
+    mask = 0
+    for card in cards:
+        mask |= card.mask
+    return mask
+
+def mask_to_cards(mask: int) -> list[Card]:
+    """
+    Converts a card bitmask back into a list of cards.
+    
+    Args:
+        mask (int): The bitmask of the cards, as returned by cards_to_mask.
+        
+    Returns:
+        list[Card]: The Card objects in the mask, ordered by id.
+    """
+    cards = []
+    while mask:
+        lowest_bit = mask & -mask
+        cards.append(_CARDS[lowest_bit.bit_length() - 1])
+        mask ^= lowest_bit
+    return cards
+
+RANK_SYMBOLS = {"A": 14, "K": 13, "Q": 12, "J": 11, "T": 10, **{str(value): value for value in range(2, 10)}}
+SUIT_SYMBOLS = {"s": 1, "h": 2, "d": 3, "c": 4}
+_SYMBOL_CARDS = {rank + suit: Card(suit_value, value) for rank, value in RANK_SYMBOLS.items() for suit, suit_value in SUIT_SYMBOLS.items()}
+_CARD_SYMBOLS = {card: symbol for symbol, card in _SYMBOL_CARDS.items()}
+
+def parse_cards(text: str) -> list[Card]:
+    """
+    Parses cards written in short notation, a rank symbol (2-9, T, J, Q, K or A) followed by a suit symbol (s, h, d or c).
+    Cards may be separated by whitespace, commas or '|' (e.g. 'As Kd | 7h 8h 9c') or written back to back (e.g. 'AsKd').
+
+    Args:
+        text (str): The cards to parse.
+
+    Raises:
+        ValueError: If the text contains an invalid card.
+
+    Returns:
+        list[Card]: The parsed Card objects, in order.
+    """
+    cards = []
+    for token in text.replace("|", " ").replace(",", " ").split():
+        if len(token) % 2: raise ValueError(f"Invalid card notation '{token}'.")
+        for start in range(0, len(token), 2):
+            card = _SYMBOL_CARDS.get(token[start:start + 2])
+            if card is None: raise ValueError(f"Invalid card notation '{token[start:start + 2]}'.")
+            cards.append(card)
+    return cards
+
+def format_cards(cards: list[Card], separator: str = " ") -> str:
+    """
+    Writes cards in short notation, the inverse of parse_cards.
+
+    Args:
+        cards (list[Card]): The cards to write.
+        separator (str, optional): The text placed between cards. Defaults to " ".
+
+    Returns:
+        str: The cards in short notation, e.g. 'As Kd'.
+    """
+    return separator.join(_CARD_SYMBOLS[card] for card in cards)
 
 class Deck:
-    """Represents a deck of playing cards composed of Card objects."""
+    """
+    Represents a deck of playing cards composed of Card objects.
+    The deck is stored as a fixed array of the 52 card ids with a pointer to the top card and a bitmask of the cards taken out, so it can be shuffled, dealt and reset without allocating new cards.
+    """
     
-    def __init__(self) -> None:
-        """Initializes a new deck of playing cards. The deck will automatically be ordered as per suit and value."""
-        self.cards: list[Card] = []
-        self.original_ordered_cards: list[Card] = []
+    def __init__(self, rng: random.Random = None) -> None:
+        """
+        Initializes a new deck of playing cards. The deck will automatically be ordered as per suit and value.
+        
+        Args:
+            rng (random.Random, optional): The random generator used for shuffling and selecting cards, for reproducible deals. Defaults to None, using the global generator of the random module.
+        """
+        self.rng = random if rng is None else rng
+        self._order: list[int] = list(_ORDERED_IDS)
+        self._top: int = 0
+        self._removed_mask: int = 0
+        self._count: int = 52
         self.is_ordered: bool = True
-        self.reset_deck()
         
     def __len__(self) -> int:
-        return len(self.cards)
+        return self._count
+    
+    @property
+    def cards(self) -> list[Card]:
+        """list[Card]: The cards currently in the deck, from top to bottom."""
+        removed_mask = self._removed_mask
+        return [_CARDS[card_id] for card_id in self._order[self._top:] if not removed_mask >> card_id & 1]
+    
+    @property
+    def original_ordered_cards(self) -> list[Card]:
+        """list[Card]: All 52 cards in their original order."""
+        return list(_CARDS)
+    
+    @property
+    def removed_mask(self) -> int:
+        """int: The bitmask of the cards that are not currently in the deck."""
+        return self._removed_mask
+    
+    def reset(self) -> None:
+        """Returns all 52 cards to the deck in their original order, reusing the existing storage."""
+        self._order[:] = _ORDERED_IDS
+        self._top = 0
+        self._removed_mask = 0
+        self._count = 52
+        self.is_ordered = True
         
     def reset_deck(self) -> None:
         """Resets the deck to the initial state with all 52 cards in order - mimicking a new deck."""
-        self.cards = []
-        
-        for suit in range(1,5):
-            for value in range (2,15):
-                self.cards.append(Card(suit, value))
-
-        self.original_ordered_cards = deepcopy(self.cards)
-        self.is_ordered = True
+        self.reset()
         
     def order_cards(self) -> None:
         """Orders the cards in the deck back to their original ordered state."""
-        self.cards = deepcopy(self.original_ordered_cards)
-        self.is_ordered = True
+        self.reset()
 
     def shuffle_cards(self) -> None:
-        """Shuffles the deck randomly."""
-        random.shuffle(self.cards)
+        """Shuffles the deck randomly, using an in-place Fisher-Yates shuffle over the card ids still in the deck."""
+        order, top, rand = self._order, self._top, self.rng.random
+        for i in range(51, top, -1):
+            j = top + int(rand() * (i - top + 1))
+            order[i], order[j] = order[j], order[i]
         self.is_ordered = False
         
+    def _advance_top(self) -> None:
+        """Moves the top pointer past any cards that have been taken out of the deck."""
+        order, top, removed_mask = self._order, self._top, self._removed_mask
+        while top < 52 and removed_mask >> order[top] & 1:
+            top += 1
+        self._top = top
+        
+    def _compact(self) -> None:
+        """Rebuilds the array with the removed cards first and the cards still in the deck last, preserving their order, so the live region holds no removed cards and every id stays in the array once."""
+        removed_mask = self._removed_mask
+        removed, remaining = [], []
+        for card_id in self._order:
+            (removed if removed_mask >> card_id & 1 else remaining).append(card_id)
+        self._top = len(removed)
+        self._order[:] = removed + remaining
+        
     def remove_cards(self, *args: Card) -> None:
         """
         Removes specified cards from the deck.
@@ -77,17 +225,26 @@ class Deck:
             args (Card): An unpacked list of Card objects to be removed from the deck.
         """
         for card in args: 
-            if card in self.cards: self.cards.remove(card)
+            if not self._removed_mask & card.mask:
+                self._removed_mask |= card.mask
+                self._count -= 1
+        self._advance_top()
             
     def append_cards(self, *args: Card) -> None:
         """
-        Adds specified cards to the deck if they are not already present.
-        
+        Adds specified cards to the bottom of the deck, in the order given, if they are not already present.
+
         Args:
             args (Card): An unpacked list of Card objects to be added to the deck.
         """
-        for card in args: 
-            if card not in self.cards: self.cards.append(card)
+        for card in args:
+            if self._removed_mask & card.mask:
+                self._removed_mask ^= card.mask
+                self._count += 1
+                position = self._order.index(card.id)
+                del self._order[position]
+                self._order.append(card.id)
+                if position < self._top: self._top -= 1
         
     def select_random_cards(self, amount: int, remove_cards: bool = None) -> list[Card]:
         """
@@ -104,8 +261,19 @@ class Deck:
             list[Card]: A list of randomly selected Card objects.
         """
         self.should_remove_cards = True if remove_cards is None else remove_cards
-        if amount < 1 or amount > len(self.cards): raise ValueError("Invalid amount of cards to select.")
-        cards = random.sample(self.cards, amount)
+        if amount < 1 or amount > self._count: raise ValueError("Invalid amount of cards to select.")
+        if self._count * 2 < 52 - self._top: self._compact()
+        
+        order, top, rand = self._order, self._top, self.rng.random
+        span = 52 - top
+        taken_mask = self._removed_mask
+        cards = []
+        while len(cards) < amount:
+            card_id = order[top + int(rand() * span)]
+            if not taken_mask >> card_id & 1:
+                taken_mask |= 1 << card_id
+                cards.append(_CARDS[card_id])
+                
         if self.should_remove_cards == True: self.remove_cards(*cards)
         return cards
     
@@ -124,31 +292,51 @@ class Deck:
             list[Card]: A list of randomly selected Card objects.
         """
         self.should_remove_cards = True if remove_cards is None else remove_cards
-        if amount < 1 or amount > len(self.cards): raise ValueError("Invalid amount of cards to select.")
-        cards = self.cards[:amount]
+        if amount < 1 or amount > self._count: raise ValueError("Invalid amount of cards to select.")
+        
+        order, removed_mask = self._order, self._removed_mask
+        cards = []
+        position = self._top
+        while len(cards) < amount:
+            card_id = order[position]
+            if not removed_mask >> card_id & 1: cards.append(_CARDS[card_id])
+            position += 1
+            
         if self.should_remove_cards == True: self.remove_cards(*cards)
         return cards
         
-def _complete_hands(existing_cards: list[Card]) -> list[list[Card]]:
+def _iter_complete_hands(existing_cards: list[Card]) -> Iterator[tuple[Card, ...]]:
     """
-    Generates all possible complete poker hands based on the given cards.
+    Lazily generates all possible complete poker hands based on the given cards, so only one hand is held in memory at a time.
 
     Args:
         existing_cards (list[Card]): List of cards that are already part of the hand.
 
-    Returns:
-        list[list[Card]]: A list of possible hands.
+    Yields:
+        tuple[Card, ...]: A possible hand of 5 cards.
     """
     if len(existing_cards) < 5:
-        all_cards = set(Deck().cards)
-        existing_set = set(existing_cards)
-        remaining_cards = list(all_cards - existing_set)
+        existing_cards = tuple(existing_cards)
+        remaining_cards = mask_to_cards(FULL_DECK_MASK & ~cards_to_mask(existing_cards))
         needed_cards = 5 - len(existing_cards)
-        return [existing_cards + list(combo) for combo in combinations(remaining_cards, needed_cards)]
+        for combo in combinations(remaining_cards, needed_cards):
+            yield existing_cards + combo
     elif len(existing_cards) > 5:
-        return [list(combo) for combo in combinations(existing_cards, 5)]
+        yield from combinations(existing_cards, 5)
     else:
-        return [list(existing_cards)]
+        yield tuple(existing_cards)
+
+def _complete_hands(existing_cards: list[Card]) -> list[list[Card]]:
+    """
+    Generates all possible complete poker hands based on the given cards.
+
+    Args:
+        existing_cards (list[Card]): List of cards that are already part of the hand.
+
+    Returns:
+        list[list[Card]]: A list of possible hands.
+    """
+    return [list(possible_hand) for possible_hand in _iter_complete_hands(existing_cards)]
     
 def _evaluate_combo(cards: list[Card]) -> tuple[str, int, int]:
     """
@@ -167,10 +355,11 @@ def _evaluate_combo(cards: list[Card]) -> tuple[str, int, int]:
         raise ValueError("Invalid number of cards: there must be exactly 5 cards.")
     
     def calculate_hand_score(base_score: int) -> int:
-        card_values = sorted((card.value for card in cards), reverse=True)
+        card_values = sorted((card.value for card in cards), key=lambda value: (value_counts[value], value), reverse=True)
+        if card_values == [14, 5, 4, 3, 2] and is_straight(): card_values = [5, 4, 3, 2, 1]
         score = base_score
         for i, value in enumerate(card_values):
-            score += value * (10 ** (4 - i))
+            score += value * (15 ** (4 - i))
         return score
 
     def is_flush() -> bool:
@@ -186,16 +375,16 @@ def _evaluate_combo(cards: list[Card]) -> tuple[str, int, int]:
     value_counts = Counter(card.value for card in cards)
 
     base_scores = {
-        "royal flush": 10**6,
-        "straight flush": 8*10**5,
-        "four of a kind": 7*10**5,
-        "full house": 6*10**5,
-        "flush": 5*10**5,
-        "straight": 4*10**5,
-        "three of a kind": 3*10**5,
-        "two pair": 2*10**5,
-        "one pair": 10**5,
-        "high card": 100
+        "royal flush": 9*10**6,
+        "straight flush": 8*10**6,
+        "four of a kind": 7*10**6,
+        "full house": 6*10**6,
+        "flush": 5*10**6,
+        "straight": 4*10**6,
+        "three of a kind": 3*10**6,
+        "two pair": 2*10**6,
+        "one pair": 10**6,
+        "high card": 0
     }
 
     if is_straight() and is_flush():
@@ -227,39 +416,410 @@ def _evaluate_combo(cards: list[Card]) -> tuple[str, int, int]:
 
     return "high card", highest_card(), calculate_hand_score(base_scores["high card"])
 
-def rank_hand(hand: list[Card]) -> tuple[dict[str, any], dict[str, any]]:
+_PRIMES = [0, 0, 2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+_RANK_BITS = [0, 0] + [1 << (value - 2) for value in range(2, 15)]
+_STRAIGHTS = [[14, 13, 12, 11, 10]] + [[top - i for i in range(5)] for top in range(13, 5, -1)] + [[5, 4, 3, 2, 14]]
+
+_FLUSH_LOOKUP: list[int] = [0] * 8192
+_UNIQUE5_LOOKUP: list[int] = [0] * 8192
+_PAIRED_LOOKUP: dict[int, int] = {}
+_MULTISET_LOOKUP: dict[int, int] = {}
+_MASK_LOOKUP: dict[int, int] = {}
+_HAND_INFO: list[tuple[str, int, int, tuple[int, ...]]] = [("", 0, 0, ())]
+_COMBO_RANKINGS: dict[str, int] = {}
+
+def _build_lookup_tables() -> None:
     """
-    Ranks a poker hand in its best and worst form by considering all possible hand completions, providing information on the hand combination name, the hands themselves, the highest card, and the hand's value respectively.
+    Fills the five-card lookup tables by enumerating every rank multiset (with and without a flush), ordering the resulting 7462 equivalence classes by strength and storing the strength of each class under its lookup key.
+    The combination name, highest card, primary rank and kickers of each class are stored under its strength, and the combination rankings are derived from the order the names appear in.
+    Flushes and hands with five unique ranks are keyed by their rank bitmask, paired hands by the product of their rank primes.
+    The flush table also holds the best flush of every six and seven-card suit bitmask, so a suit with more than five cards is still a single lookup.
+    """
+    category_strength = {
+        "high card": 0, "one pair": 1, "two pair": 2, "three of a kind": 3, "straight": 4,
+        "flush": 5, "full house": 6, "four of a kind": 7, "straight flush": 8, "royal flush": 9
+    }
+    straight_tops = {sum(_RANK_BITS[value] for value in straight): straight[0] for straight in _STRAIGHTS}
+    classes = []
+    
+    for values in combinations_with_replacement(range(14, 1, -1), 5):
+        counts = Counter(values)
+        if max(counts.values()) > 4: continue
+        bits = sum(_RANK_BITS[value] for value in counts)
+        grouped = sorted(counts, key=lambda value: (counts[value], value), reverse=True)
+        shape = sorted(counts.values(), reverse=True)
+        
+        if len(counts) == 5:
+            top = straight_tops.get(bits)
+            if top is None:
+                options = [("high card", grouped, False), ("flush", grouped, True)]
+            else:
+                options = [("straight", [top], False), ("royal flush" if top == 14 else "straight flush", [top], True)]
+        elif shape[0] == 4: options = [("four of a kind", grouped, False)]
+        elif shape[:2] == [3, 2]: options = [("full house", grouped, False)]
+        elif shape[0] == 3: options = [("three of a kind", grouped, False)]
+        elif shape[:2] == [2, 2]: options = [("two pair", grouped, False)]
+        else: options = [("one pair", grouped, False)]
+        
+        for name, tiebreak, is_flush in options:
+            classes.append(((category_strength[name], tiebreak), name, values, bits, is_flush))
+    
+    classes.sort(key=lambda hand_class: hand_class[0])
+    
+    for strength, ((_, tiebreak), name, values, bits, is_flush) in enumerate(classes, start=1):
+        _HAND_INFO.append((name, values[0], tiebreak[0], tuple(tiebreak[1:])))
+        if is_flush: _FLUSH_LOOKUP[bits] = strength
+        elif len(set(values)) == 5: _UNIQUE5_LOOKUP[bits] = strength
+        else: _PAIRED_LOOKUP[math.prod(_PRIMES[value] for value in values)] = strength
+    
+    for bits in range(8192):
+        if bin(bits).count("1") in (6, 7):
+            rank_bits = [bit for bit in _RANK_BITS[2:] if bits & bit]
+            _FLUSH_LOOKUP[bits] = max(_FLUSH_LOOKUP[sum(combo)] for combo in combinations(rank_bits, 5))
+    
+    for name, *_ in reversed(_HAND_INFO[1:]):
+        _COMBO_RANKINGS.setdefault(name, len(_COMBO_RANKINGS) + 1)
+
+_build_lookup_tables()
 
+def evaluate5(cards: list[Card]) -> int:
+    """
+    Evaluates a five-card hand through the precomputed lookup tables, using a constant number of lookups.
+    
+    Args:
+        cards (list[Card]): A list of exactly 5 Card objects representing a poker hand.
+        
+    Raises:
+        ValueError: If the provided list of cards is not 5 cards in length.
+        
+    Returns:
+        int: The strength of the hand between 1 and 7462, where a higher value is a stronger hand and equal values are equal hands.
+    """
+    if len(cards) != 5:
+        raise ValueError("Invalid number of cards: there must be exactly 5 cards.")
+    
+    c1, c2, c3, c4, c5 = cards
+    bits = _RANK_BITS[c1.value] | _RANK_BITS[c2.value] | _RANK_BITS[c3.value] | _RANK_BITS[c4.value] | _RANK_BITS[c5.value]
+    
+    if c1.suit == c2.suit == c3.suit == c4.suit == c5.suit:
+        return _FLUSH_LOOKUP[bits]
+    
+    return _UNIQUE5_LOOKUP[bits] or _PAIRED_LOOKUP[_PRIMES[c1.value] * _PRIMES[c2.value] * _PRIMES[c3.value] * _PRIMES[c4.value] * _PRIMES[c5.value]]
+
+def _evaluate_best(cards: list[Card]) -> int:
+    """
+    Evaluates the best five-card hand contained in five to seven cards without enumerating the sub-hands.
+    A suit holding five or more cards is resolved through the flush table (no other hand can beat a flush within seven cards), otherwise the rank multiset is resolved by its prime product, filling the table on first use.
+    
+    Args:
+        cards (list[Card]): A list of 5 to 7 unique Card objects.
+        
+    Returns:
+        int: The strength of the best five-card hand, on the same scale as evaluate5.
+    """
+    suit_bits = [0, 0, 0, 0, 0]
+    product = 1
+    for card in cards:
+        suit_bits[card.suit] |= _RANK_BITS[card.value]
+        product *= _PRIMES[card.value]
+        
+    for bits in suit_bits:
+        strength = _FLUSH_LOOKUP[bits]
+        if strength: return strength
+    
+    strength = _MULTISET_LOOKUP.get(product)
+    if strength is None:
+        strength = 0
+        for combo in combinations([card.value for card in cards], 5):
+            bits = _RANK_BITS[combo[0]] | _RANK_BITS[combo[1]] | _RANK_BITS[combo[2]] | _RANK_BITS[combo[3]] | _RANK_BITS[combo[4]]
+            strength = max(strength, _UNIQUE5_LOOKUP[bits] or _PAIRED_LOOKUP[math.prod(_PRIMES[value] for value in combo)])
+        _MULTISET_LOOKUP[product] = strength
+    return strength
+
+def evaluate6(cards: list[Card]) -> int:
+    """
+    Evaluates the best five-card hand that can be made from six cards.
+    
+    Args:
+        cards (list[Card]): A list of exactly 6 unique Card objects.
+        
+    Raises:
+        ValueError: If the provided list of cards is not 6 cards in length.
+        
+    Returns:
+        int: The strength of the best hand between 1 and 7462, on the same scale as evaluate5.
+    """
+    if len(cards) != 6:
+        raise ValueError("Invalid number of cards: there must be exactly 6 cards.")
+    return _evaluate_best(cards)
+
+def evaluate7(cards: list[Card]) -> int:
+    """
+    Evaluates the best five-card hand that can be made from seven cards, such as two hole cards and a full board.
+    
+    Args:
+        cards (list[Card]): A list of exactly 7 unique Card objects.
+        
+    Raises:
+        ValueError: If the provided list of cards is not 7 cards in length.
+        
+    Returns:
+        int: The strength of the best hand between 1 and 7462, on the same scale as evaluate5.
+    """
+    if len(cards) != 7:
+        raise ValueError("Invalid number of cards: there must be exactly 7 cards.")
+    return _evaluate_best(cards)
+
+def evaluate_mask(mask: int) -> int:
+    """
+    Evaluates the best five-card hand contained in a bitmask of five to seven cards, without creating any Card objects once the hand's rank counts have been seen.
+    
+    Args:
+        mask (int): The bitmask of the cards, as returned by cards_to_mask.
+        
+    Raises:
+        ValueError: If the mask does not contain between 5 and 7 cards.
+        
+    Returns:
+        int: The strength of the best hand between 1 and 7462, on the same scale as evaluate5.
+    """
+    if not 5 <= bin(mask & FULL_DECK_MASK).count("1") <= 7 or mask >> 52:
+        raise ValueError("Invalid number of cards: there must be between 5 and 7 cards.")
+    
+    a, b, c, d = mask & 0x1FFF, (mask >> 13) & 0x1FFF, (mask >> 26) & 0x1FFF, mask >> 39
+    strength = _FLUSH_LOOKUP[a] or _FLUSH_LOOKUP[b] or _FLUSH_LOOKUP[c] or _FLUSH_LOOKUP[d]
+    if strength: return strength
+    
+    key = (a | b | c | d) | (((a | b) & (c | d) | a & b | c & d) << 13) | ((a & b & (c | d) | c & d & (a | b)) << 26) | ((a & b & c & d) << 39)
+    strength = _MASK_LOOKUP.get(key)
+    if strength is None:
+        strength = _MASK_LOOKUP[key] = _evaluate_best(mask_to_cards(mask))
+    return strength
+
+class RankCache:
+    """
+    A bounded, thread-safe LRU cache of hand ranking results, shared by rank_hand and compare_hands (and so by the engine and player scripts).
+    Hands are stored under their suit-isomorphic canonical form, so hands that only differ by a permutation of suits share one entry.
+    """
+    
+    def __init__(self, maxsize: int = 4096, enabled: bool = True) -> None:
+        """
+        Initializes an empty cache.
+        
+        Args:
+            maxsize (int, optional): The maximum number of entries kept before the least recently used entry is evicted. Defaults to 4096.
+            enabled (bool, optional): Whether rank_hand and compare_hands use the cache. Defaults to True.
+        """
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: tuple) -> any:
+        """
+        Looks up an entry, marking it as the most recently used.
+        
+        Args:
+            key (tuple): The key of the entry.
+            
+        Returns:
+            any: The cached value, or None if the key is not cached.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        metrics = metrics_manager.active
+        if metrics is not None: metrics.increment("rank_cache.misses" if value is None else "rank_cache.hits")
+        return value
+        
+    def put(self, key: tuple, value: any) -> None:
+        """
+        Stores an entry, evicting the least recently used entries while the cache is over its maximum size.
+        
+        Args:
+            key (tuple): The key of the entry.
+            value (any): The value to cache. Must not be modified afterwards.
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                
+    def clear(self) -> None:
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+            
+    def info(self) -> dict[str, any]:
+        """
+        Reports the state of the cache.
+        
+        Returns:
+            dict: A dictionary containing keys 'hits', 'misses', 'evictions', 'size', 'maxsize' and 'enabled'.
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._entries), "maxsize": self.maxsize, "enabled": self.enabled}
+
+rank_cache = RankCache()
+
+def _canonical_suits(cards: list[Card]) -> tuple[tuple[int, ...], list[int], list[int]]:
+    """
+    Relabels the suits of a hand so that suits holding higher rank bitmasks come first, giving the same form to every suit permutation of the hand.
+    
+    Args:
+        cards (list[Card]): The unique Card objects of the hand.
+        
+    Returns:
+        tuple: The rank bitmask of each canonical suit, a list mapping canonical suits to the hand's suits and a list mapping the hand's suits to canonical suits (both indexed by suit).
+    """
+    mask = cards_to_mask(cards)
+    suit_masks = [0] + [(mask >> shift) & 0x1FFF for shift in (0, 13, 26, 39)]
+    order = sorted(range(1, 5), key=lambda suit: suit_masks[suit], reverse=True)
+    to_canonical = [0] * 5
+    for canonical_suit, suit in enumerate(order, start=1):
+        to_canonical[suit] = canonical_suit
+    return tuple(suit_masks[suit] for suit in order), [0] + order, to_canonical
+
+def _relabel(cards: list[Card], suit_map: list[int]) -> list[Card]:
+    """
+    Changes the suits of cards according to a suit mapping.
+    
+    Args:
+        cards (list[Card]): The Card objects to relabel.
+        suit_map (list[int]): The new suit of each suit, indexed by suit.
+        
+    Returns:
+        list[Card]: The relabeled Card objects, in the same order.
+    """
+    return [_CARDS[(suit_map[card.suit] - 1) * 13 + card.value - 2] for card in cards]
+
+def _best_strength(hand: list[Card]) -> int:
+    """
+    Finds the strength of the best possible hand, using the direct evaluators where possible instead of ranking every completion.
+    Hands that need completing go through rank_cache when it is enabled.
+    
     Args:
         hand (list[Card]): The list of Card objects representing the current hand.
         
     Raises:
         ValueError: If the list of cards is empty or duplicate cards appear.
+        
+    Returns:
+        int: The strength of the best possible hand, on the same scale as evaluate5.
+    """
+    if len(hand) < 1: raise ValueError("The length of the hand must be above 1.")
+    if len(set(hand)) != len(hand): raise ValueError("The hand must contain only unique cards.")
+    
+    if 5 <= len(hand) <= 7:
+        return _evaluate_best(hand)
+    if not rank_cache.enabled:
+        return max(evaluate5(possible_hand) for possible_hand in _iter_complete_hands(hand))
+    
+    suit_masks, _, to_canonical = _canonical_suits(hand)
+    key = ("best", suit_masks)
+    strength = rank_cache.get(key)
+    if strength is None:
+        strength = max(evaluate5(possible_hand) for possible_hand in _iter_complete_hands(_relabel(hand, to_canonical)))
+        rank_cache.put(key, strength)
+    return strength
+
+def get_rank_info(rank: int) -> dict[str, any]:
+    """
+    Describes the equivalence class of a hand strength, as returned by the evaluators and stored in the 'value' of rank_hand results.
+    
+    Args:
+        rank (int): The strength of a hand, between 1 and 7462.
+        
+    Raises:
+        ValueError: If the rank is out of the valid range.
+        
+    Returns:
+        dict: A dictionary containing keys 'combo_name', 'combo_ranking', 'highest_card', 'primary_rank' and 'kickers'. The primary rank is the card value deciding the hand first (e.g. the rank of the pair, or the top card of a straight) and the kickers are the remaining deciding values in order.
+    """
+    if rank not in range(1, len(_HAND_INFO)): raise ValueError(f"Rank is not in range of 1-{len(_HAND_INFO) - 1}.")
+    name, highest_card, primary_rank, kickers = _HAND_INFO[rank]
+    return {"combo_name": name, "combo_ranking": _COMBO_RANKINGS[name], "highest_card": highest_card, "primary_rank": primary_rank, "kickers": kickers}
+
+def rank_hand(hand: list[Card], max_hands: int = None) -> tuple[dict[str, any], dict[str, any]]:
+    """
+    Ranks a poker hand in its best and worst form by considering all possible hand completions, providing information on the hand combination name, the hands themselves, the highest card, and the hand's value respectively.
+    The value is the hand's strength between 1 and 7462, so values of different hands can be compared directly (see get_rank_info).
+    Completions are evaluated lazily, so memory use does not grow with the number of missing cards when max_hands is set.
+    Results are cached in rank_cache when it is enabled, in which case the order of the returned hands may differ between calls.
+
+    Args:
+        hand (list[Card]): The list of Card objects representing the current hand.
+        max_hands (int, optional): The maximum number of example hands kept for each scenario. Use 0 to only return the values and counts. Defaults to None, keeping every tying hand.
+        
+    Raises:
+        ValueError: If the list of cards is empty, duplicate cards appear or max_hands is negative.
 
     Returns:
-        tuple: Two dictionaries containing the best and worst case scenarios (in that respective order), which contain keys 'combo_name', 'hands', 'highest_card' and 'value'.
+        tuple: Two dictionaries containing the best and worst case scenarios (in that respective order), which contain keys 'combo_name', 'hands', 'highest_card', 'value' and 'count' (the number of completions reaching the value).
     """
     if len(hand) < 1: raise ValueError("The length of the hand must be above 1.")
     if len(set(hand)) != len(hand): raise ValueError("The hand must contain only unique cards.")
+    if max_hands is not None and max_hands < 0: raise ValueError("The maximum amount of hands kept cannot be negative.")
+    metrics = metrics_manager.active
+    if metrics is not None: start = time.perf_counter()
     
-    best_case_scenario = {"combo_name" : None, "hands" : [], "highest_card": None, "value" : -1}
-    worst_case_scenario = {"combo_name" : None, "hands" : [], "highest_card": None, "value" : math.inf}
-    possible_hands = _complete_hands(hand)
+    if not rank_cache.enabled:
+        result = _rank_completions(hand, max_hands)
+    else:
+        suit_masks, to_suit, to_canonical = _canonical_suits(hand)
+        key = ("rank", suit_masks, max_hands)
+        result = rank_cache.get(key)
+        if result is None:
+            result = _rank_completions(_relabel(hand, to_canonical), max_hands)
+            rank_cache.put(key, result)
+        result = tuple({**scenario, "hands": [_relabel(possible_hand, to_suit) for possible_hand in scenario["hands"]]} for scenario in result)
+        
+    if metrics is not None:
+        metrics.increment("hands_evaluated")
+        metrics.observe("rank_hand", time.perf_counter() - start)
+    return result
+
+def _rank_completions(hand: list[Card], max_hands: int) -> tuple[dict[str, any], dict[str, any]]:
+    """
+    Ranks every completion of a hand for rank_hand, without validation or caching.
+    
+    Args:
+        hand (list[Card]): The list of unique Card objects representing the current hand.
+        max_hands (int): The maximum number of example hands kept for each scenario, or None to keep every tying hand.
+        
+    Returns:
+        tuple: The best and worst case scenarios, as returned by rank_hand.
+    """
+    best_value, best_count, best_hands = -1, 0, []
+    worst_value, worst_count, worst_hands = math.inf, 0, []
     
-    for possible_hand in possible_hands:
-        result = _evaluate_combo(possible_hand)
+    for possible_hand in _iter_complete_hands(hand):
+        value = evaluate5(possible_hand)
             
-        if result[2] == best_case_scenario["value"]:
-            best_case_scenario["hands"].append(possible_hand)
-        elif result[2] > best_case_scenario["value"]:
-            best_case_scenario = {"combo_name" : result[0], "hands" : [possible_hand], "highest_card": result[1], "value" : result[2]}
+        if value >= best_value:
+            if value > best_value: best_value, best_count, best_hands = value, 0, []
+            best_count += 1
+            if max_hands is None or len(best_hands) < max_hands: best_hands.append(list(possible_hand))
         
-        if result[2] == worst_case_scenario["value"]:
-            worst_case_scenario["hands"].append(possible_hand)
-        if result[2] < worst_case_scenario["value"]:
-            worst_case_scenario = {"combo_name" : result[0], "hands" : [possible_hand], "highest_card": result[1], "value" : result[2]}
+        if value <= worst_value:
+            if value < worst_value: worst_value, worst_count, worst_hands = value, 0, []
+            worst_count += 1
+            if max_hands is None or len(worst_hands) < max_hands: worst_hands.append(list(possible_hand))
     
+    best_case_scenario = {"combo_name" : _HAND_INFO[best_value][0], "hands" : best_hands, "highest_card": _HAND_INFO[best_value][1], "value" : best_value, "count": best_count}
+    worst_case_scenario = {"combo_name" : _HAND_INFO[worst_value][0], "hands" : worst_hands, "highest_card": _HAND_INFO[worst_value][1], "value" : worst_value, "count": worst_count}
     return best_case_scenario, worst_case_scenario
 
 def get_combo_ranking(hand_name: str) -> int:
@@ -275,9 +835,8 @@ def get_combo_ranking(hand_name: str) -> int:
     Returns:
         int: An integer representing the position of the hand combination in the ranking.
     """
-    rankings = ["royal flush", "straight flush", "four of a kind", "full house", "flush", "straight", "three of a kind", "two pair", "one pair", "high card"]
     try:
-        return rankings.index(hand_name.lower()) + 1
+        return _COMBO_RANKINGS[hand_name.lower()]
     except:
         raise ValueError("Hand combination name does not exist.")
     
@@ -291,11 +850,513 @@ def compare_hands(*hands: list[Card]) -> list[int]:
     Returns:
         list[int]: A list containing the positions of hands in the ranking, placed in the same order as the argument list. 
     """
-    hand_values = [rank_hand(hand)[0]['value'] for hand in hands]
+    metrics = metrics_manager.active
+    if metrics is not None: start = time.perf_counter()
+    hand_values = [_best_strength(hand) for hand in hands]
     indexed_values = list(enumerate(hand_values))
     indexed_values.sort(key=lambda x: x[1], reverse=True)
     position = last_val = 0
     for original_position, value in indexed_values:
         if value != last_val: position += 1
         hand_values[original_position] = position
-    return hand_values
\ No newline at end of file
+        last_val = value
+        
+    if metrics is not None:
+        metrics.increment("hands_evaluated", len(hands))
+        metrics.observe("compare_hands", time.perf_counter() - start)
+    return hand_values
+
+def _straight_top(bits: int) -> int:
+    """
+    Finds the highest straight within a rank bitmask.
+    
+    Args:
+        bits (int): A 13-bit rank bitmask, with bit 0 for a 2 and bit 12 for an Ace.
+        
+    Returns:
+        int: The value of the top card of the highest straight (5 for a wheel), or 0 if there is no straight.
+    """
+    bits = bits << 1 | bits >> 12
+    runs = bits & bits >> 1 & bits >> 2 & bits >> 3 & bits >> 4
+    return runs.bit_length() + 4 if runs else 0
+
+def _rank_category(bits: int, pairs: int, trips: int, quads: int) -> int:
+    """
+    Determines the combo ranking of the best hand made from a set of ranks, ignoring flushes.
+    
+    Args:
+        bits (int): The rank bitmask of the cards.
+        pairs (int): The number of ranks held exactly twice.
+        trips (int): The number of ranks held exactly three times.
+        quads (int): The number of ranks held four times.
+        
+    Returns:
+        int: The combo ranking of the hand, as returned by get_combo_ranking.
+    """
+    if quads: return _COMBO_RANKINGS["four of a kind"]
+    if trips >= 2 or (trips and pairs): return _COMBO_RANKINGS["full house"]
+    if _straight_top(bits): return _COMBO_RANKINGS["straight"]
+    if trips: return _COMBO_RANKINGS["three of a kind"]
+    if pairs >= 2: return _COMBO_RANKINGS["two pair"]
+    if pairs: return _COMBO_RANKINGS["one pair"]
+    return _COMBO_RANKINGS["high card"]
+
+def _rank_multisets(available: list[int], amount: int) -> list[tuple[dict[int, int], int]]:
+    """
+    Lists every multiset of ranks that can be drawn from the available cards, along with the number of card combinations producing it.
+    
+    Args:
+        available (list[int]): The number of available cards for each value, indexed by value.
+        amount (int): The number of cards drawn.
+        
+    Returns:
+        list[tuple[dict[int, int], int]]: Pairs of the drawn count for each value and the number of ways to draw them.
+    """
+    multisets = []
+    def walk(value: int, remaining: int, counts: dict[int, int], ways: int) -> None:
+        if remaining == 0:
+            multisets.append((dict(counts), ways))
+            return
+        if value > 14: return
+        walk(value + 1, remaining, counts, ways)
+        for count in range(1, min(available[value], remaining) + 1):
+            counts[value] = count
+            walk(value + 1, remaining - count, counts, ways * math.comb(available[value], count))
+        counts.pop(value, None)
+    walk(2, amount, {}, 1)
+    return multisets
+
+@lru_cache(maxsize=4096)
+def _category_counts(suit_masks: tuple[int, ...], n_total: int) -> tuple[int, ...]:
+    """
+    Counts the completions reaching each combo category for known cards given as suit rank bitmasks. The result only depends on the multiset of suit masks, so callers pass them sorted to share the cache between suit permutations.
+    
+    Every completion is first classified by its ranks alone with a dynamic program over the values. Completions holding five or more cards of one suit are then enumerated per suit and moved from their rank category to flush or straight flush, as nothing else can beat a flush within seven cards.
+    
+    Args:
+        suit_masks (tuple[int, ...]): The rank bitmask of the known cards of each suit.
+        n_total (int): The number of cards in the completed hand, between 5 and 7.
+        
+    Returns:
+        tuple[int, ...]: The number of completions for each combo ranking, indexed by ranking minus 1.
+    """
+    known_counts = [0] * 15
+    for mask in suit_masks:
+        for value in range(2, 15):
+            known_counts[value] += mask >> (value - 2) & 1
+    need = n_total - sum(known_counts)
+    counts = [0] * 10
+    
+    states = {(need, 0, 0, 0, 0): 1}
+    for value in range(2, 15):
+        available = 4 - known_counts[value]
+        next_states = {}
+        for (remaining, bits, pairs, trips, quads), ways in states.items():
+            for drawn in range(min(available, remaining) + 1):
+                held = known_counts[value] + drawn
+                key = (
+                    remaining - drawn,
+                    bits | _RANK_BITS[value] if held else bits,
+                    min(pairs + (held == 2), 2),
+                    min(trips + (held == 3), 2),
+                    quads or held == 4
+                )
+                next_states[key] = next_states.get(key, 0) + ways * math.comb(available, drawn)
+        states = next_states
+    for (remaining, bits, pairs, trips, quads), ways in states.items():
+        if remaining == 0: counts[_rank_category(bits, pairs, trips, quads) - 1] += ways
+    
+    for suit, suit_mask in enumerate(suit_masks):
+        suit_known = bin(suit_mask).count("1")
+        other_known = {value: known_counts[value] - (suit_mask >> (value - 2) & 1) for value in range(2, 15)}
+        other_available = [0, 0] + [3 - other_known[value] for value in range(2, 15)]
+        open_bits = [_RANK_BITS[value] for value in range(2, 15) if not suit_mask & _RANK_BITS[value]]
+        
+        for suited in range(max(0, 5 - suit_known), need + 1):
+            others = []
+            for drawn, ways in _rank_multisets(other_available, need - suited):
+                held = {value: count + drawn.get(value, 0) for value, count in other_known.items() if count + drawn.get(value, 0)}
+                others.append((held, ways))
+                
+            for combo in combinations(open_bits, suited):
+                flush_bits = suit_mask | sum(combo)
+                top = _straight_top(flush_bits)
+                if not top: flush_category = _COMBO_RANKINGS["flush"]
+                elif top == 14: flush_category = _COMBO_RANKINGS["royal flush"]
+                else: flush_category = _COMBO_RANKINGS["straight flush"]
+                
+                for held, ways in others:
+                    bits, tally = flush_bits, [0] * 5
+                    for value, count in held.items():
+                        bits |= _RANK_BITS[value]
+                        tally[count + (flush_bits >> (value - 2) & 1)] += 1
+                    counts[flush_category - 1] += ways
+                    counts[_rank_category(bits, tally[2], tally[3], tally[4]) - 1] -= ways
+    
+    return tuple(counts)
+
+def category_distribution(known_cards: list[Card], n_total: int = 7) -> dict[str, int]:
+    """
+    Counts how many completions of the known cards reach each combo category, without evaluating the completions one by one.
+    Results are cached per suit pattern, so repeated and suit-permuted queries are answered from memory.
+    
+    Args:
+        known_cards (list[Card]): The cards already known, such as hole cards and board cards.
+        n_total (int, optional): The number of cards in the completed hand, between 5 and 7. The best five-card hand counts. Defaults to 7.
+        
+    Raises:
+        ValueError: If n_total is out of range, there are more known cards than n_total or duplicate cards appear.
+        
+    Returns:
+        dict[str, int]: The number of completions for each combo name, ordered by combo ranking. The counts add up to the number of ways to draw the missing cards.
+    """
+    if n_total not in range(5, 8): raise ValueError("The total amount of cards must be between 5 and 7.")
+    if len(known_cards) > n_total: raise ValueError("There cannot be more known cards than the total amount of cards.")
+    if len(set(known_cards)) != len(known_cards): raise ValueError("The hand must contain only unique cards.")
+    
+    mask = cards_to_mask(known_cards)
+    suit_masks = tuple(sorted((mask >> shift) & 0x1FFF for shift in (0, 13, 26, 39)))
+    return dict(zip(_COMBO_RANKINGS, _category_counts(suit_masks, n_total)))
+
+def _showdown_share(hero_value: int, opponent_values: list[int]) -> tuple[float, int]:
+    """
+    Determines the share of the pot won by a hand against a set of opponent hands.
+    
+    Args:
+        hero_value (int): The strength of the hand.
+        opponent_values (list[int]): The strengths of the opponent hands.
+        
+    Returns:
+        tuple[float, int]: The share of the pot won, and the outcome (1 for a win, 0 for a tie, -1 for a loss).
+    """
+    best_opponent = max(opponent_values)
+    if hero_value > best_opponent: return 1.0, 1
+    if hero_value < best_opponent: return 0.0, -1
+    return 1 / (opponent_values.count(best_opponent) + 1), 0
+
+def equity(hole_cards: list[Card], board_cards: list[Card] = None, n_opponents: int = 1, samples: int = 5000, time_limit: float = None, tolerance: float = None, exact_limit: int = 50000) -> dict[str, any]:
+    """
+    Calculates the equity of a pair of hole cards against a number of opponents holding unknown cards, given a partial board.
+    The outcomes are enumerated exactly when there are few enough of them (e.g. on the turn or river), otherwise they are sampled with Monte Carlo until the sample count, time limit or tolerance is reached.
+    
+    Args:
+        hole_cards (list[Card]): The 2 hole cards of the hand.
+        board_cards (list[Card], optional): The 0 to 5 board cards already dealt. Defaults to None, meaning no board cards.
+        n_opponents (int, optional): The number of opponents. Defaults to 1.
+        samples (int, optional): The maximum number of Monte Carlo samples. Defaults to 5000.
+        time_limit (float, optional): The maximum number of seconds spent sampling. Defaults to None, meaning no limit.
+        tolerance (float, optional): The standard error at which sampling stops early. Defaults to None, meaning sampling runs until the sample count or time limit.
+        exact_limit (int, optional): The maximum number of outcomes enumerated exactly. Defaults to 50000.
+        
+    Raises:
+        ValueError: If the amount of hole cards, board cards or opponents is invalid, or duplicate cards appear.
+        
+    Returns:
+        dict: A dictionary containing keys 'equity' (the expected share of the pot), 'win', 'tie' and 'loss' (the probability of each outcome), 'samples' (the number of outcomes evaluated), 'exact', 'std_error' and 'converged' (whether the tolerance was reached, always True when exact).
+    """
+    board_cards = [] if board_cards is None else list(board_cards)
+    if len(hole_cards) != 2: raise ValueError("There must be exactly 2 hole cards.")
+    if len(board_cards) > 5: raise ValueError("There cannot be more than 5 board cards.")
+    if n_opponents < 1: raise ValueError("There must be at least 1 opponent.")
+    if len(set(hole_cards + board_cards)) != len(hole_cards) + len(board_cards): raise ValueError("The hand must contain only unique cards.")
+    if samples < 1: raise ValueError("There must be at least 1 sample.")
+    
+    deck = Deck()
+    deck.remove_cards(*hole_cards, *board_cards)
+    remaining_cards = deck.cards
+    board_needed = 5 - len(board_cards)
+    if board_needed + 2 * n_opponents > len(remaining_cards): raise ValueError("Not enough cards left for the amount of opponents.")
+    
+    outcome_count = math.comb(len(remaining_cards), board_needed)
+    for i in range(n_opponents):
+        outcome_count *= math.comb(len(remaining_cards) - board_needed - 2 * i, 2)
+        
+    total_share = total_share_squared = 0.0
+    results = {1: 0, 0: 0, -1: 0}
+    evaluated = 0
+    
+    if outcome_count <= exact_limit:
+        for extra_cards in combinations(remaining_cards, board_needed):
+            full_board = board_cards + list(extra_cards)
+            hero_value = _evaluate_best(hole_cards + full_board)
+            extra_mask = cards_to_mask(extra_cards)
+            pool = [card for card in remaining_cards if not card.mask & extra_mask]
+            pairs = [(first.mask | second.mask, _evaluate_best([first, second] + full_board)) for first, second in combinations(pool, 2)]
+            
+            def assign(used_mask: int, opponent_values: list[int]) -> None:
+                nonlocal total_share, evaluated
+                if len(opponent_values) == n_opponents:
+                    share, outcome = _showdown_share(hero_value, opponent_values)
+                    total_share += share
+                    results[outcome] += 1
+                    evaluated += 1
+                    return
+                for pair_mask, value in pairs:
+                    if not pair_mask & used_mask:
+                        opponent_values.append(value)
+                        assign(used_mask | pair_mask, opponent_values)
+                        opponent_values.pop()
+            assign(0, [])
+            
+        mean = total_share / evaluated
+        return {"equity": mean, "win": results[1] / evaluated, "tie": results[0] / evaluated, "loss": results[-1] / evaluated, "samples": evaluated, "exact": True, "std_error": 0.0, "converged": True}
+    
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    drawn_amount = board_needed + 2 * n_opponents
+    std_error = math.inf
+    
+    while evaluated < samples:
+        drawn = deck.select_random_cards(drawn_amount, remove_cards=False)
+        full_board = board_cards + drawn[:board_needed]
+        hero_value = _evaluate_best(hole_cards + full_board)
+        opponent_values = [_evaluate_best(drawn[i:i + 2] + full_board) for i in range(board_needed, drawn_amount, 2)]
+        share, outcome = _showdown_share(hero_value, opponent_values)
+        total_share += share
+        total_share_squared += share * share
+        results[outcome] += 1
+        evaluated += 1
+        
+        if evaluated & 255 == 0:
+            if evaluated > 1:
+                mean = total_share / evaluated
+                std_error = math.sqrt(max(total_share_squared / evaluated - mean * mean, 0.0) / (evaluated - 1))
+            if tolerance is not None and std_error <= tolerance: break
+            if deadline is not None and time.perf_counter() >= deadline: break
+    
+    mean = total_share / evaluated
+    if evaluated > 1: std_error = math.sqrt(max(total_share_squared / evaluated - mean * mean, 0.0) / (evaluated - 1))
+    converged = tolerance is not None and std_error <= tolerance
+    return {"equity": mean, "win": results[1] / evaluated, "tie": results[0] / evaluated, "loss": results[-1] / evaluated, "samples": evaluated, "exact": False, "std_error": std_error, "converged": converged}
+
+class HandEvaluator:
+    """
+    Evaluates one player's hand incrementally as the board is dealt, instead of ranking hole cards and board from scratch on every street.
+    Adding a card only updates the card masks, and the table of river strengths built on the flop is narrowed to the runouts containing the new card rather than evaluated again.
+    """
+    
+    def __init__(self, hole_cards: list[Card], board_cards: list[Card] = None) -> None:
+        """
+        Initializes the evaluator with the hole cards and any board cards already dealt.
+        
+        Args:
+            hole_cards (list[Card]): The hole cards of the hand.
+            board_cards (list[Card], optional): The board cards already dealt. Defaults to None, meaning no board cards.
+            
+        Raises:
+            ValueError: If there are more than 7 cards or duplicate cards appear.
+        """
+        self.hole_cards = list(hole_cards)
+        self.board_cards = []
+        self.mask = cards_to_mask(self.hole_cards)
+        if len(set(self.hole_cards)) != len(self.hole_cards): raise ValueError("The hand must contain only unique cards.")
+        if len(self.hole_cards) > 7: raise ValueError("There cannot be more than 7 cards.")
+        
+        self._suit_masks = [0, 0, 0, 0]
+        for card in self.hole_cards:
+            self._suit_masks[card.suit - 1] |= _RANK_BITS[card.value]
+        self._runouts: dict[int, int] = None
+        self._next_strengths: dict[int, int] = None
+        
+        for card in board_cards or []:
+            self.add_board_card(card)
+            
+    @property
+    def cards(self) -> list[Card]:
+        """The hole cards followed by the board cards."""
+        return self.hole_cards + self.board_cards
+    
+    def add_board_card(self, card: Card) -> None:
+        """
+        Adds a newly dealt board card to the hand.
+        
+        Args:
+            card (Card): The board card.
+            
+        Raises:
+            ValueError: If the hand already holds 7 cards or the card is already part of it.
+        """
+        if self.mask & card.mask: raise ValueError("The hand must contain only unique cards.")
+        if len(self.hole_cards) + len(self.board_cards) >= 7: raise ValueError("There cannot be more than 7 cards.")
+        
+        self.board_cards.append(card)
+        self.mask |= card.mask
+        self._suit_masks[card.suit - 1] |= _RANK_BITS[card.value]
+        if self._runouts is not None:
+            self._runouts = {runout & ~card.mask: strength for runout, strength in self._runouts.items() if runout & card.mask}
+        self._next_strengths = None
+        
+    @property
+    def strength(self) -> int:
+        """The strength of the best five-card hand made so far, on the same scale as evaluate5, or None with fewer than 5 cards."""
+        if len(self.hole_cards) + len(self.board_cards) < 5: return None
+        return evaluate_mask(self.mask)
+    
+    def rank_info(self) -> dict[str, any]:
+        """
+        Describes the best five-card hand made so far.
+        
+        Raises:
+            ValueError: If the hand holds fewer than 5 cards.
+            
+        Returns:
+            dict: The description of the hand, as returned by get_rank_info.
+        """
+        if self.strength is None: raise ValueError("The hand must hold at least 5 cards.")
+        return get_rank_info(self.strength)
+    
+    def _runout_strengths(self) -> dict[int, int]:
+        """Builds (once per hand, from the flop on) the strength of every completion to 7 cards, keyed by the mask of the missing cards."""
+        if self._runouts is None:
+            unseen = [card.mask for card in mask_to_cards(FULL_DECK_MASK & ~self.mask)]
+            needed = 7 - len(self.hole_cards) - len(self.board_cards)
+            self._runouts = {}
+            for combo in combinations(unseen, needed):
+                runout = sum(combo)
+                self._runouts[runout] = evaluate_mask(self.mask | runout)
+        return self._runouts
+    
+    def outs(self) -> list[Card]:
+        """
+        Lists the unseen cards that would improve the combo category of the hand if dealt next.
+        
+        Raises:
+            ValueError: If the hand does not hold 5 or 6 cards.
+            
+        Returns:
+            list[Card]: The improving cards, ordered by their id.
+        """
+        known = len(self.hole_cards) + len(self.board_cards)
+        if known not in (5, 6): raise ValueError("Outs are only defined for hands of 5 or 6 cards.")
+        
+        if self._next_strengths is None:
+            if known == 6 and self._runouts is not None:
+                self._next_strengths = {runout.bit_length() - 1: strength for runout, strength in self._runouts.items()}
+            else:
+                self._next_strengths = {card.id: evaluate_mask(self.mask | card.mask) for card in mask_to_cards(FULL_DECK_MASK & ~self.mask)}
+        
+        current = _COMBO_RANKINGS[_HAND_INFO[self.strength][0]]
+        return [_CARDS[card_id] for card_id, strength in sorted(self._next_strengths.items()) if _COMBO_RANKINGS[_HAND_INFO[strength][0]] < current]
+    
+    def draws(self) -> dict[str, any]:
+        """
+        Describes the flush and straight draws of the hand, which are only open while the hand holds fewer than 7 cards.
+        
+        Returns:
+            dict: A dictionary containing keys 'flush_draw' (whether a suit holds exactly 4 cards without a flush being made) and 'straight_draw' ('open-ended' when four values in a row can be completed at either end, 'double gutshot' when two values complete a straight without four in a row, 'gutshot' when one does, otherwise None).
+        """
+        if len(self.hole_cards) + len(self.board_cards) >= 7: return {"flush_draw": False, "straight_draw": None}
+        
+        flush_made = any(bin(suit_mask).count("1") >= 5 for suit_mask in self._suit_masks)
+        flush_draw = not flush_made and any(bin(suit_mask).count("1") == 4 for suit_mask in self._suit_masks)
+        
+        bits = self._suit_masks[0] | self._suit_masks[1] | self._suit_masks[2] | self._suit_masks[3]
+        straight_values = 0 if _straight_top(bits) else sum(1 for value in range(2, 15) if not bits & _RANK_BITS[value] and _straight_top(bits | _RANK_BITS[value]))
+        low_ace_bits = bits << 1 | bits >> 12
+        four_in_a_row = low_ace_bits & low_ace_bits >> 1 & low_ace_bits >> 2 & low_ace_bits >> 3
+        straight_draw = ("open-ended" if four_in_a_row else "double gutshot") if straight_values >= 2 else "gutshot" if straight_values == 1 else None
+        return {"flush_draw": flush_draw, "straight_draw": straight_draw}
+    
+    def completion_stats(self) -> dict[str, any]:
+        """
+        Counts how the hand can finish on the river. From the flop on, the counts come from the table of runout strengths, which later streets narrow instead of rebuilding. Before the flop they come from category_distribution.
+        
+        Returns:
+            dict: A dictionary containing keys 'completions' (the number of ways to deal the missing cards) and 'categories' (the number of completions reaching each combo name, ordered by combo ranking).
+        """
+        if len(self.hole_cards) + len(self.board_cards) < 5:
+            categories = category_distribution(self.cards, 7)
+        else:
+            categories = dict.fromkeys(_COMBO_RANKINGS, 0)
+            for strength in self._runout_strengths().values():
+                categories[_HAND_INFO[strength][0]] += 1
+        return {"completions": sum(categories.values()), "categories": categories}
+    
+PREFLOP_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preflop_equity.bin")
+PREFLOP_TABLE_MAGIC = b"PKEQ"
+PREFLOP_TABLE_HEADER = struct.Struct("<4sHHH")
+_preflop_table: mmap.mmap = None
+_preflop_max_opponents: int = 0
+
+def preflop_index(hole_cards: list[Card]) -> int:
+    """
+    Finds the index of a pair of hole cards among the 169 strategically distinct preflop holdings.
+    The holdings form a 13 by 13 grid from Aces down to 2s, with pairs on the diagonal, suited holdings above it and offsuit holdings below it.
+    
+    Args:
+        hole_cards (list[Card]): The 2 hole cards.
+        
+    Raises:
+        ValueError: If there are not exactly 2 unique hole cards.
+        
+    Returns:
+        int: The index of the holding, between 0 and 168.
+    """
+    if len(hole_cards) != 2 or hole_cards[0] == hole_cards[1]: raise ValueError("There must be exactly 2 unique hole cards.")
+    high, low = sorted((card.value for card in hole_cards), reverse=True)
+    if hole_cards[0].suit == hole_cards[1].suit: return (14 - high) * 13 + (14 - low)
+    return (14 - low) * 13 + (14 - high)
+
+def preflop_holding(index: int) -> tuple[str, list[Card]]:
+    """
+    Describes a preflop holding by its index, as returned by preflop_index.
+    
+    Args:
+        index (int): The index of the holding, between 0 and 168.
+        
+    Raises:
+        ValueError: If the index is out of the valid range.
+        
+    Returns:
+        tuple[str, list[Card]]: The name of the holding (e.g. 'AKs', 'AKo' or 'AA') and a pair of hole cards representing it.
+    """
+    if index not in range(169): raise ValueError("Index is not in range of 0-168.")
+    row, column = divmod(index, 13)
+    symbols = {14: "A", 13: "K", 12: "Q", 11: "J", 10: "T", **{value: str(value) for value in range(2, 10)}}
+    if row == column: return symbols[14 - row] * 2, [Card(1, 14 - row), Card(2, 14 - row)]
+    if row < column: return symbols[14 - row] + symbols[14 - column] + "s", [Card(1, 14 - row), Card(1, 14 - column)]
+    return symbols[14 - column] + symbols[14 - row] + "o", [Card(1, 14 - column), Card(2, 14 - row)]
+
+def load_preflop_table(path: str = None) -> None:
+    """
+    Memory-maps a preflop equity table written by generate_equity_tables.py. The pages are shared between processes mapping the same file.
+    Called automatically by preflop_equity on first use.
+    
+    Args:
+        path (str, optional): The path of the table. Defaults to None, using PREFLOP_TABLE_PATH.
+        
+    Raises:
+        FileNotFoundError: If the table does not exist.
+        ValueError: If the file is not a valid preflop equity table.
+    """
+    global _preflop_table, _preflop_max_opponents
+    with open(PREFLOP_TABLE_PATH if path is None else path, "rb") as file:
+        table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    if len(table) < PREFLOP_TABLE_HEADER.size:
+        table.close()
+        raise ValueError("File is not a valid preflop equity table.")
+    magic, version, holdings, max_opponents = PREFLOP_TABLE_HEADER.unpack_from(table)
+    if magic != PREFLOP_TABLE_MAGIC or version != 1 or holdings != 169 or len(table) != PREFLOP_TABLE_HEADER.size + holdings * max_opponents * 4:
+        table.close()
+        raise ValueError("File is not a valid preflop equity table.")
+    _preflop_table, _preflop_max_opponents = table, max_opponents
+
+def preflop_equity(hole_cards: list[Card], n_opponents: int = 1) -> float:
+    """
+    Looks up the precomputed equity of a pair of hole cards against random opponents before any board cards are dealt.
+    
+    Args:
+        hole_cards (list[Card]): The 2 hole cards.
+        n_opponents (int, optional): The number of opponents. Defaults to 1.
+        
+    Raises:
+        FileNotFoundError: If no table has been generated (see generate_equity_tables.py).
+        ValueError: If the hole cards are invalid or the table does not cover the number of opponents.
+        
+    Returns:
+        float: The expected share of the pot.
+    """
+    if _preflop_table is None: load_preflop_table()
+    if n_opponents not in range(1, _preflop_max_opponents + 1): raise ValueError(f"Number of opponents is not in range of 1-{_preflop_max_opponents}.")
+    offset = PREFLOP_TABLE_HEADER.size + (preflop_index(hole_cards) * _preflop_max_opponents + n_opponents - 1) * 4
+    return struct.unpack_from("<f", _preflop_table, offset)[0]
@@ -0,0 +1,224 @@
+"""
+Module containing a streaming evaluator for large files of hands in short card notation, one hand of 5 to 7 cards per line (e.g. 'As Kd | 7h 8h 9c Tc 2s', see cards_manager.parse_cards).
+Files are read in chunks of whole lines, parsed straight into arrays of card ids with byte lookup tables and evaluated with batch_manager.evaluate_batch, so memory stays flat whatever the file size.
+Each input line gives one output line holding the strength of the hand and its combo name separated by a tab, and blank lines stay blank.
+
+Usage: python dataset_manager.py hands.txt results.tsv [--processes 4] [--chunk-size 4194304]
+"""
+
+import argparse, os, shutil
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import batch_manager, cards_manager
+
+_SEPARATORS = b" \t\r,|"
+_RANK_BYTES = np.full(256, -1, dtype=np.int16)
+_SUIT_BYTES = np.full(256, -1, dtype=np.int16)
+for symbol, value in cards_manager.RANK_SYMBOLS.items():
+    _RANK_BYTES[ord(symbol)] = value - 2
+for symbol, suit in cards_manager.SUIT_SYMBOLS.items():
+    _SUIT_BYTES[ord(symbol)] = (suit - 1) * 13
+
+_RESULT_LINES = np.array([b"\n"] + [f"{strength}\t{name}\n".encode() for strength, (name, *_) in enumerate(cards_manager._HAND_INFO) if strength], dtype=object)
+
+def parse_hand_ids(data: bytes, first_line: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parses lines of hands in short notation into card ids, without creating Card objects.
+
+    Args:
+        data (bytes): The lines to parse. A final newline is optional.
+        first_line (int, optional): The line number of the first line, used in error messages. Defaults to 1.
+
+    Raises:
+        ValueError: If a line contains invalid card notation.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: An int8 array of shape (number of lines, 7) holding the card ids of each line, padded with -1, and the number of cards of each line (0 for blank lines).
+    """
+    lines = data.translate(None, _SEPARATORS).split(b"\n")
+    if not data or data.endswith(b"\n"): lines.pop()
+
+    lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+    invalid = np.flatnonzero((lengths % 2 == 1) | (lengths > 14))
+    if invalid.size: raise ValueError(f"Invalid card notation on line {first_line + invalid[0]}.")
+
+    counts = lengths // 2
+    ends = np.cumsum(counts)
+    symbols = np.frombuffer(b"".join(lines), dtype=np.uint8).reshape(-1, 2)
+    ranks, suits = _RANK_BYTES[symbols[:, 0]], _SUIT_BYTES[symbols[:, 1]]
+    invalid = np.flatnonzero((ranks < 0) | (suits < 0))
+    if invalid.size: raise ValueError(f"Invalid card notation on line {first_line + np.searchsorted(ends, invalid[0], side='right')}.")
+
+    rows = np.repeat(np.arange(len(lines)), counts)
+    columns = np.arange(len(rows)) - np.repeat(ends - counts, counts)
+    card_ids = np.full((len(lines), 7), -1, dtype=np.int8)
+    card_ids[rows, columns] = ranks + suits
+    return card_ids, counts.astype(np.int8)
+
+def evaluate_lines(data: bytes, first_line: int = 1) -> np.ndarray:
+    """
+    Evaluates lines of hands in short notation.
+
+    Args:
+        data (bytes): The lines to evaluate. A final newline is optional.
+        first_line (int, optional): The line number of the first line, used in error messages. Defaults to 1.
+
+    Raises:
+        ValueError: If a line contains invalid card notation, a number of cards other than 5 to 7 or duplicate cards.
+
+    Returns:
+        np.ndarray: An int32 array holding the strength of each line's hand between 1 and 7462 (see batch_manager.evaluate_batch), or 0 for blank lines.
+    """
+    card_ids, counts = parse_hand_ids(data, first_line)
+    invalid = np.flatnonzero((counts > 0) & (counts < 5))
+    if invalid.size: raise ValueError(f"Line {first_line + invalid[0]} must contain 5 to 7 cards.")
+
+    strengths = np.zeros(len(counts), dtype=np.int32)
+    for count in range(5, 8):
+        rows = np.flatnonzero(counts == count)
+        if not rows.size: continue
+        try:
+            strengths[rows] = batch_manager.evaluate_batch(card_ids[rows, :count])
+        except ValueError:
+            card_masks = np.left_shift(np.int64(1), card_ids[rows, :count].astype(np.int64))
+            duplicate = rows[np.flatnonzero(card_masks.sum(axis=1) != np.bitwise_or.reduce(card_masks, axis=1))[0]]
+            raise ValueError(f"Line {first_line + duplicate} must contain only unique cards.") from None
+    return strengths
+
+def _iter_chunks(file, end: int, chunk_size: int):
+    """Reads a file from its current position up to the end offset, yielding the offset and data of chunks of whole lines of about chunk_size bytes."""
+    position, remainder = file.tell(), b""
+    while file.tell() < end:
+        data = remainder + file.read(min(chunk_size, end - file.tell()))
+        cut = data.rfind(b"\n") + 1
+        if not cut:
+            remainder = data
+            continue
+        data, remainder = data[:cut], data[cut:]
+        yield position, data
+        position += len(data)
+    if remainder: yield position, remainder
+
+def iter_strengths(input_path: str, chunk_size: int = 1 << 22):
+    """
+    Streams the strengths of the hands of a file, one chunk of lines at a time.
+
+    Args:
+        input_path (str): The path of the file, holding one hand in short notation per line.
+        chunk_size (int, optional): The number of bytes read at once. Defaults to 4194304.
+
+    Raises:
+        ValueError: If a line is invalid.
+
+    Yields:
+        np.ndarray: The strengths of the lines of each chunk, as returned by evaluate_lines.
+    """
+    line = 1
+    with open(input_path, "rb") as file:
+        for _, data in _iter_chunks(file, os.fstat(file.fileno()).st_size, chunk_size):
+            strengths = evaluate_lines(data, line)
+            line += len(strengths)
+            yield strengths
+
+def _evaluate_range(input_path: str, output_path: str, start: int, end: int, chunk_size: int) -> dict[str, any]:
+    """
+    Evaluates the lines of a byte range of a file and writes the results, in the current process.
+
+    Args:
+        input_path (str): The path of the file.
+        output_path (str): The path the results are written to.
+        start (int): The offset of the first line of the range.
+        end (int): The offset just after the last line of the range.
+        chunk_size (int): The number of bytes read at once.
+
+    Returns:
+        dict: A dictionary containing keys 'lines', 'hands' and 'error' (the offset and size of the first chunk holding an invalid line, or None).
+    """
+    lines, hands = 0, 0
+    with open(input_path, "rb") as file, open(output_path, "wb") as output:
+        file.seek(start)
+        for position, data in _iter_chunks(file, end, chunk_size):
+            try:
+                strengths = evaluate_lines(data)
+            except ValueError:
+                return {"lines": lines, "hands": hands, "error": (position, len(data))}
+            output.write(b"".join(_RESULT_LINES[strengths].tolist()))
+            lines += len(strengths)
+            hands += int(np.count_nonzero(strengths))
+    return {"lines": lines, "hands": hands, "error": None}
+
+def _raise_chunk_error(input_path: str, position: int, size: int) -> None:
+    """Evaluates a chunk that failed again in the current process, so its error reports the line number counted from the start of the file."""
+    with open(input_path, "rb") as file:
+        first_line = 1
+        while file.tell() < position:
+            first_line += file.read(min(1 << 22, position - file.tell())).count(b"\n")
+        evaluate_lines(file.read(size), first_line)
+
+def _shard_offsets(input_path: str, shards: int) -> list[int]:
+    """Splits a file into byte ranges of about equal size that start at the beginning of a line, returning the boundaries."""
+    size = os.path.getsize(input_path)
+    offsets = [0]
+    with open(input_path, "rb") as file:
+        for index in range(1, shards):
+            file.seek(size * index // shards)
+            file.readline()
+            if offsets[-1] < file.tell() < size: offsets.append(file.tell())
+    offsets.append(size)
+    return offsets
+
+def evaluate_file(input_path: str, output_path: str, processes: int = 1, chunk_size: int = 1 << 22) -> dict[str, int]:
+    """
+    Evaluates every hand of a file and writes one result line per input line, streaming both files.
+    With several processes, the file is split into byte ranges at line boundaries, each worker writes its range to a part file and the parts are joined in order.
+
+    Args:
+        input_path (str): The path of the file, holding one hand in short notation per line.
+        output_path (str): The path the results are written to, each line holding the strength and combo name of a hand separated by a tab.
+        processes (int, optional): The number of worker processes. Use None for one per CPU core. Defaults to 1, evaluating in the current process.
+        chunk_size (int, optional): The number of bytes read at once by each process. Defaults to 4194304.
+
+    Raises:
+        ValueError: If the chunk size is invalid or a line is invalid, in which case no output file is left behind.
+
+    Returns:
+        dict: A dictionary containing keys 'lines' and 'hands' (the number of non-blank lines).
+    """
+    if chunk_size < 1: raise ValueError("The chunk size must be above 0.")
+    offsets = _shard_offsets(input_path, (os.cpu_count() or 1) if processes is None else max(processes, 1))
+    part_paths = [output_path] if len(offsets) == 2 else [f"{output_path}.{index}.part" for index in range(len(offsets) - 1)]
+    arguments = [(input_path, part_path, start, end, chunk_size) for part_path, start, end in zip(part_paths, offsets, offsets[1:])]
+
+    try:
+        if len(arguments) == 1:
+            results = [_evaluate_range(*arguments[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=len(arguments)) as executor:
+                results = list(executor.map(_evaluate_range, *zip(*arguments)))
+
+        for result in results:
+            if result["error"] is not None: _raise_chunk_error(input_path, *result["error"])
+
+        if len(part_paths) > 1:
+            with open(output_path, "wb") as output:
+                for part_path in part_paths:
+                    with open(part_path, "rb") as part:
+                        shutil.copyfileobj(part, output)
+    except BaseException:
+        if os.path.exists(output_path): os.remove(output_path)
+        raise
+    finally:
+        if len(part_paths) > 1:
+            for part_path in part_paths:
+                if os.path.exists(part_path): os.remove(part_path)
+    return {"lines": sum(result["lines"] for result in results), "hands": sum(result["hands"] for result in results)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a file of hands in short card notation, one per line, writing the strength and combo name of each.")
+    parser.add_argument("input", help="file holding one hand of 5 to 7 cards per line, e.g. 'As Kd | 7h 8h 9c Tc 2s'")
+    parser.add_argument("output", help="file the results are written to")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=1 << 22, help="bytes read at once by each process")
+    args = parser.parse_args()
+
+    print(evaluate_file(args.input, args.output, args.processes, args.chunk_size))
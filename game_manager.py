@@ -1,23 +1,65 @@
-import cards_manager, importlib
+import cards_manager, metrics_manager, importlib, asyncio, inspect, time
+from collections.abc import Mapping
 from copy import deepcopy
+from functools import partial
 
 class Player:
-    def __init__(self, name: str, starting_balance: int, script_path: str):
+    def __init__(self, name: str, starting_balance: int, script_path: str, sandboxed: bool = False, sandbox_options: dict = None):
         self.name = name
         self.balance = starting_balance
         self.current_bet = 0
         self.bought_in = False
         self.folded = False
         self.hand = None
-        self.script = __import__(script_path)
+        if not isinstance(script_path, str):
+            self.script = script_path
+        elif sandboxed:
+            import sandbox_manager
+            self.script = sandbox_manager.SandboxedScript(script_path, **(sandbox_options or {}))
+        else:
+            self.script = __import__(script_path)
+
+class SeatView(Mapping):
+    """A read-only, live view of a player's public state, handed to bots in place of a freshly built dict."""
+    __slots__ = ("_player", "_keys")
+    
+    BUY_IN_KEYS = ("name", "balance", "bought_in", "folded")
+    BETTING_KEYS = ("name", "balance", "current_bet", "folded")
+    
+    def __init__(self, player: Player, keys: tuple[str, ...]):
+        self._player = player
+        self._keys = keys
+        
+    def __getitem__(self, key: str):
+        if key not in self._keys: raise KeyError(key)
+        return getattr(self._player, key)
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def __repr__(self) -> str:
+        return repr(dict(self))
+    
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+STREET_NAMES = ("buy_in", "flop", "turn", "river")
 
 class Game:
-    def __init__(self, players: list[Player], buy_in_cost: int):
+    def __init__(self, players: list[Player], buy_in_cost: int, deck: cards_manager.Deck = None, recorder = None):
         self.players = players
+        self.recorder = recorder
         self.non_folded_player_count = len(players)
         self.buy_in_cost = buy_in_cost
         self.pot = 0
-        self.deck = cards_manager.Deck()
+        if deck is None:
+            self.deck = cards_manager.Deck()
+        else:
+            self.deck = deck
+            self.deck.reset()
         self.deck.shuffle_cards()
         self.board_cards = []
         self.round_count = 0
@@ -28,8 +70,15 @@ class Game:
         
         for player in self.players:
             player.hand = self.deck.draw_cards(2)
+        if self.recorder is not None: self.recorder.start_game(buy_in_cost, players)
+            
+        self._buy_in_opponents = {player: tuple(SeatView(op, SeatView.BUY_IN_KEYS) for op in self.players if op != player) for player in self.players}
+        self._betting_opponents = {player: tuple(SeatView(op, SeatView.BETTING_KEYS) for op in self.players if op != player) for player in self.players}
                 
     def run_game(self):
+        metrics = metrics_manager.active
+        if metrics is not None: return self._run_game_instrumented(metrics)
+        
         self.buy_in_round()
         
         for r in range(1, 4):
@@ -38,56 +87,38 @@ class Game:
                 
         return self.winner
     
+    def _run_game_instrumented(self, metrics: metrics_manager.Metrics):
+        game_start = start = time.perf_counter()
+        self.buy_in_round()
+        metrics.observe("street.buy_in", time.perf_counter() - start)
+        
+        for r in range(1, 4):
+            if not self.game_ended:
+                start = time.perf_counter()
+                self.round(r)
+                metrics.observe(f"street.{STREET_NAMES[r]}", time.perf_counter() - start)
+                
+        metrics.increment("games")
+        metrics.observe("game", time.perf_counter() - game_start)
+        return self.winner
+    
     def buy_in_round(self):
         for player in self.players:
-            
-            opponent_states = []
-            
-            for op in self.players:
-                if op != player:
-                    opponent_states.append({"name": op.name, "balance": op.balance, "bought_in" : op.bought_in, "folded": op.folded})
-            
             try:
-                response = player.script.on_confirm_buy_in(
-                    balance = player.balance,
-                    hand = player.hand,
-                    opponents = opponent_states,
-                    buy_in_cost = self.buy_in_cost
-                )
+                response = self._call_script(player, "on_confirm_buy_in", self._buy_in_arguments(player))
             except Exception as e:
-                player.folded = True
-                self.non_folded_player_count -= 1
+                self._hook_failed(player)
                 try: player.script.error_fold(f"Buy in function failed to execute because: {e}")
                 except: pass
                 continue              
             
-            if response == True:
-                if player.balance >= self.buy_in_cost:
-                    player.bought_in = True
-                    player.balance -= self.buy_in_cost
-                    self.pot += self.buy_in_cost
-                else:
-                    player.folded = True
-                    self.non_folded_player_count -= 1
-                    try: player.script.error_fold("Not enough balance for attempted buy in.")
-                    except: pass
-            else:
-                player.folded = True
-                self.non_folded_player_count -= 1
-                if response != False: 
-                    try: player.script.error_fold("No valid response provided for buy in.")
-                    except: pass
+            message = self._apply_buy_in(player, response)
+            if message is not None:
+                try: player.script.error_fold(message)
+                except: pass
             
     def round(self, betting_round: int):
-        self.round_count = betting_round
-        self.current_check_value = 0
-        self.raise_count = 0
-        last_raiser = None
-        
-        if betting_round == 1:
-            self.board_cards += self.deck.draw_cards(3)
-        else:
-            self.board_cards += self.deck.draw_cards(1)
+        last_raiser = self._start_round(betting_round)
 
         while True:
             active = False
@@ -95,81 +126,142 @@ class Game:
                 if player.folded:
                     continue
 
-                if last_raiser == player or sum(1 for p in self.players if not p.folded) == 1:
+                if last_raiser == player or self.non_folded_player_count == 1:
                     break
 
-                opponent_states = []
-            
-                for op in self.players:
-                    if op != player:
-                        opponent_states.append({"name": op.name, "balance": op.balance, "current_bet": op.current_bet, "folded": op.folded})
-
                 try:
-                    response = player.script.on_betting_round(
-                        round=self.round_count,
-                        balance=player.balance,
-                        current_bet=player.current_bet,
-                        hand=player.hand,
-                        board_cards=self.board_cards,
-                        opponents=opponent_states,
-                        check_value=self.current_check_value,
-                        raise_count=self.raise_count,
-                        pot=self.pot
-                    )
+                    response = self._call_script(player, "on_betting_round", self._betting_arguments(player))
                 except Exception as e:
-                    player.folded = True
-                    self.non_folded_player_count -= 1
+                    self._hook_failed(player)
+                    try: player.script.error_fold(f"Betting function failed to execute because: {e}")
+                    except: pass
                     continue 
                 
-                if response == "check":
-                    if player.current_bet != self.current_check_value:
-                        player.folded = True
-                        self.non_folded_player_count -= 1
-                        try: player.script.error_fold(f"Attempted to check while not matching the current check value.")
-                        except: pass
-                if response == "match":
-                    if player.current_bet == self.current_check_value:
-                        print(f"Player {player.name} attempted to match while already being at check value. Checking instead.")
-                    elif player.balance < (self.current_check_value - player.current_bet):
-                        try: player.script.error_fold(f"Attempted to match while not having enough balance.")
-                        except: pass
-                    else:
-                        remainder = self.current_check_value - player.current_bet
-                        player.balance -= remainder
-                        player.current_bet = self.current_check_value
-                if isinstance(response, int):
-                    if response < 1:
-                        player.folded = True
-                        self.non_folded_player_count -= 1
-                        try: player.script.error_fold("Cannot raise with a value that is 0 or below.")
-                        except: pass 
-                    elif player.balance < response:
-                        player.folded = True
-                        self.non_folded_player_count -= 1
-                        try: player.script.error_fold("Not enough balance for attempted raise.")
-                        except: pass
-                    else:
-                        player.balance -= response
-                        player.current_bet += response
-                        active = True
-                        self.raise_count += 1
-                        last_raiser = player
-                        self.current_check_value = player.current_bet
-                if response == "fold":
-                    player.folded = True
-                    self.non_folded_player_count -= 1
+                raised, message = self._apply_bet(player, response)
+                if message is not None:
+                    try: player.script.error_fold(message)
+                    except: pass
+                if raised:
+                    active = True
+                    last_raiser = player
         
             if not active:
                 break
 
+        self._end_round(betting_round)
+        
+    def _fold(self, player: Player):
+        player.folded = True
+        self.non_folded_player_count -= 1
+        
+    def _call_script(self, player: Player, hook_name: str, arguments: dict):
+        metrics = metrics_manager.active
+        if metrics is None: return getattr(player.script, hook_name)(**arguments)
+        
+        start = time.perf_counter()
+        try:
+            return getattr(player.script, hook_name)(**arguments)
+        finally:
+            metrics.observe(f"{hook_name}.{player.name}", time.perf_counter() - start)
+        
+    def _hook_failed(self, player: Player):
+        if self.recorder is not None: self.recorder.error(player)
+        metrics = metrics_manager.active
+        if metrics is not None: metrics.increment("bot_errors")
+        self._fold(player)
+        
+    def _buy_in_arguments(self, player: Player) -> dict:
+        return {"balance": player.balance, "hand": player.hand, "opponents": self._buy_in_opponents[player], "buy_in_cost": self.buy_in_cost}
+    
+    def _apply_buy_in(self, player: Player, response) -> str:
+        if self.recorder is not None: self.recorder.buy_in(player, response)
+        if response == True:
+            if player.balance >= self.buy_in_cost:
+                player.bought_in = True
+                player.balance -= self.buy_in_cost
+                self.pot += self.buy_in_cost
+            else:
+                self._fold(player)
+                return "Not enough balance for attempted buy in."
+        else:
+            self._fold(player)
+            if response != False: 
+                return "No valid response provided for buy in."
+        return None
+    
+    def _start_round(self, betting_round: int):
+        self.round_count = betting_round
+        self.current_check_value = 0
+        self.raise_count = 0
+        
+        if betting_round == 1:
+            dealt = self.deck.draw_cards(3)
+        else:
+            dealt = self.deck.draw_cards(1)
+        self.board_cards += dealt
+        if self.recorder is not None: self.recorder.board(dealt)
+            
+        return None
+    
+    def _betting_arguments(self, player: Player) -> dict:
+        return {
+            "round": self.round_count,
+            "balance": player.balance,
+            "current_bet": player.current_bet,
+            "hand": player.hand,
+            "board_cards": self.board_cards,
+            "opponents": self._betting_opponents[player],
+            "check_value": self.current_check_value,
+            "raise_count": self.raise_count,
+            "pot": self.pot
+        }
+        
+    def _apply_bet(self, player: Player, response) -> tuple[bool, str]:
+        if self.recorder is not None: self.recorder.bet(player, response)
+        message = None
+        
+        if response == "check":
+            if player.current_bet != self.current_check_value:
+                self._fold(player)
+                message = "Attempted to check while not matching the current check value."
+        if response == "match":
+            if player.current_bet == self.current_check_value:
+                print(f"Player {player.name} attempted to match while already being at check value. Checking instead.")
+            elif player.balance < (self.current_check_value - player.current_bet):
+                message = "Attempted to match while not having enough balance."
+            else:
+                remainder = self.current_check_value - player.current_bet
+                player.balance -= remainder
+                player.current_bet = self.current_check_value
+        if isinstance(response, int):
+            if response < 1:
+                self._fold(player)
+                message = "Cannot raise with a value that is 0 or below."
+            elif player.balance < response:
+                self._fold(player)
+                message = "Not enough balance for attempted raise."
+            else:
+                player.balance -= response
+                player.current_bet += response
+                self.raise_count += 1
+                self.current_check_value = player.current_bet
+                return True, None
+        if response == "fold":
+            self._fold(player)
+            
+        return False, message
+    
+    def _end_round(self, betting_round: int):
         for player in self.players:
             self.pot += player.current_bet
             player.current_bet = 0
 
-        if betting_round == 3 or sum(1 for p in self.players if not p.folded) == 1:
+        if betting_round == 3 or self.non_folded_player_count == 1:
             self.calc_winner()
                 
     def calc_winner(self):
+        metrics = metrics_manager.active
+        if metrics is not None: start = time.perf_counter()
         self.game_ended = True
         valid_players = []
         valid_hands = []
@@ -185,4 +277,116 @@ class Game:
         else:
             for player in self.players:
                 if not player.folded:
-                    self.winner = player
\ No newline at end of file
+                    self.winner = player
+                    
+        if self.recorder is not None: self.recorder.showdown(self.pot, self.winner)
+        if metrics is not None: metrics.observe("showdown", time.perf_counter() - start)
+
+class AsyncGame(Game):
+    """A Game whose bot hooks may be coroutines, so many tables can share one event loop. A player whose decision exceeds decision_timeout seconds is folded."""
+    
+    def __init__(self, players: list[Player], buy_in_cost: int, deck: cards_manager.Deck = None, decision_timeout: float = None, threaded_sync_hooks: bool = False, recorder = None):
+        super().__init__(players, buy_in_cost, deck, recorder)
+        self.decision_timeout = decision_timeout
+        self.threaded_sync_hooks = threaded_sync_hooks
+        
+    async def run_game(self):
+        metrics = metrics_manager.active
+        game_start = start = time.perf_counter()
+        await self.buy_in_round()
+        if metrics is not None: metrics.observe("street.buy_in", time.perf_counter() - start)
+        
+        for r in range(1, 4):
+            if not self.game_ended:
+                start = time.perf_counter()
+                await self.round(r)
+                if metrics is not None: metrics.observe(f"street.{STREET_NAMES[r]}", time.perf_counter() - start)
+                
+        if metrics is not None:
+            metrics.increment("games")
+            metrics.observe("game", time.perf_counter() - game_start)
+        return self.winner
+    
+    async def buy_in_round(self):
+        for player in self.players:
+            try:
+                response = await self._call_script(player, "on_confirm_buy_in", self._buy_in_arguments(player))
+            except asyncio.TimeoutError:
+                self._hook_failed(player)
+                await self._error_fold(player, f"Buy in function timed out after {self.decision_timeout} seconds.")
+                continue
+            except Exception as e:
+                self._hook_failed(player)
+                await self._error_fold(player, f"Buy in function failed to execute because: {e}")
+                continue
+            
+            message = self._apply_buy_in(player, response)
+            if message is not None:
+                await self._error_fold(player, message)
+                
+    async def round(self, betting_round: int):
+        last_raiser = self._start_round(betting_round)
+
+        while True:
+            active = False
+            for player in self.players:
+                if player.folded:
+                    continue
+
+                if last_raiser == player or self.non_folded_player_count == 1:
+                    break
+
+                try:
+                    response = await self._call_script(player, "on_betting_round", self._betting_arguments(player))
+                except asyncio.TimeoutError:
+                    self._hook_failed(player)
+                    await self._error_fold(player, f"Betting function timed out after {self.decision_timeout} seconds.")
+                    continue
+                except Exception as e:
+                    self._hook_failed(player)
+                    await self._error_fold(player, f"Betting function failed to execute because: {e}")
+                    continue
+                
+                raised, message = self._apply_bet(player, response)
+                if message is not None:
+                    await self._error_fold(player, message)
+                if raised:
+                    active = True
+                    last_raiser = player
+        
+            if not active:
+                break
+
+        self._end_round(betting_round)
+        
+    async def _call_script(self, player: Player, hook_name: str, arguments: dict):
+        metrics = metrics_manager.active
+        if metrics is None: return await self._call_hook(getattr(player.script, hook_name), **arguments)
+        
+        start = time.perf_counter()
+        try:
+            return await self._call_hook(getattr(player.script, hook_name), **arguments)
+        finally:
+            metrics.observe(f"{hook_name}.{player.name}", time.perf_counter() - start)
+        
+    async def _call_hook(self, hook, *args, **kwargs):
+        if self.threaded_sync_hooks and not inspect.iscoroutinefunction(hook):
+            response = asyncio.get_running_loop().run_in_executor(None, partial(hook, *args, **kwargs))
+        else:
+            start = time.perf_counter()
+            response = hook(*args, **kwargs)
+            if not inspect.isawaitable(response):
+                # Synchronous hooks cannot be interrupted, so the deadline is checked once they return.
+                if self.decision_timeout is not None and time.perf_counter() - start > self.decision_timeout:
+                    raise asyncio.TimeoutError
+                await asyncio.sleep(0)
+                return response
+            
+        return await asyncio.wait_for(response, self.decision_timeout)
+    
+    async def _error_fold(self, player: Player, message: str):
+        try: await self._call_hook(player.script.error_fold, message)
+        except: pass
+
+async def run_tables(games: list[AsyncGame]) -> list:
+    return await asyncio.gather(*(game.run_game() for game in games))
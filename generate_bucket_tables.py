@@ -0,0 +1,233 @@
+"""
+Tool generating the card-abstraction bucket tables used by bucket_manager.bucket.
+
+Every holding of a street is described by the distribution of its hand strength on the river (the share of random opponent hands it beats), over the runouts of its board. Holdings are then grouped either by equal-frequency quantiles of their mean strength ('equity') or by k-means over their cumulative strength histograms ('histogram', comparing distributions by an L2 distance akin to the earth mover's distance).
+
+Usage: python generate_bucket_tables.py --street flop [--buckets 16] [--method histogram] [--runouts 64] [--bins 8] [--seed 0] [--output buckets_flop.bin]
+"""
+
+import argparse, math, sys
+import numpy as np
+from itertools import combinations
+import batch_manager, bucket_manager, cards_manager
+
+_COMBO_IDS = np.array([(low, high) for high in range(52) for low in range(high)], dtype=np.int8)
+_COMBO_MASKS = np.left_shift(np.int64(1), _COMBO_IDS[:, 0].astype(np.int64)) | np.left_shift(np.int64(1), _COMBO_IDS[:, 1].astype(np.int64))
+_CARD_COMBOS = np.array([[index for index, (low, high) in enumerate(_COMBO_IDS.tolist()) if card_id in (low, high)] for card_id in range(52)], dtype=np.int32)
+_FIRST_CARD_COMBOS, _SECOND_CARD_COMBOS = _CARD_COMBOS[_COMBO_IDS[:, 0]], _CARD_COMBOS[_COMBO_IDS[:, 1]]
+
+def canonical_boards(board_size: int) -> list[int]:
+    """
+    Lists the keys of the suit-isomorphic canonical boards of a street, as produced by bucket_manager.canonical_index.
+
+    Args:
+        board_size (int): The number of board cards (0, 3, 4 or 5).
+
+    Returns:
+        list[int]: The sorted board keys.
+    """
+    keys = set()
+    for board in combinations(range(52), board_size):
+        masks = [0, 0, 0, 0]
+        for card_id in board:
+            masks[card_id // 13] |= 1 << (card_id % 13)
+        keys.add(sum(mask << (13 * position) for position, mask in enumerate(sorted(masks, reverse=True))))
+    return sorted(keys)
+
+def _board_ids(board_key: int) -> list[int]:
+    """Returns the card ids of a canonical board."""
+    return [suit * 13 + value for suit in range(4) for value in range(13) if board_key >> (suit * 13 + value) & 1]
+
+def _river_strengths(boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the hand strength of every pair of hole cards on each full board, against a uniformly random opponent holding none of the same cards.
+
+    Args:
+        boards (np.ndarray): Full boards of shape (number of boards, 5).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The strength of each pair between 0 and 1, and whether the pair is live (shares no card with the board), both of shape (number of boards, 1326).
+    """
+    board_masks = np.bitwise_or.reduce(np.left_shift(np.int64(1), boards.astype(np.int64)), axis=1)
+    live = (_COMBO_MASKS[None, :] & board_masks[:, None]) == 0
+    hands = np.concatenate([np.broadcast_to(_COMBO_IDS[None], (len(boards), bucket_manager.HOLE_PAIRS, 2)), np.broadcast_to(boards[:, None], (len(boards), bucket_manager.HOLE_PAIRS, 5))], axis=2)
+    values = np.zeros(live.shape, dtype=np.int64)
+    values[live] = batch_manager.evaluate_batch(hands[live])
+
+    # Opponents beaten or tied among all live pairs, found by searching each sorted row at once through a per-row offset.
+    row_offsets = np.arange(len(boards), dtype=np.int64)[:, None]
+    below, equal = _sorted_counts(values, values, row_offsets, bucket_manager.HOLE_PAIRS)
+    below -= (~live).sum(axis=1, keepdims=True)
+    live_count = live.sum(axis=1, keepdims=True)
+
+    # Opponents holding either hole card are removed by inclusion-exclusion, as the only pair holding both is the hand itself.
+    card_values, card_dead = values[:, _CARD_COMBOS], (~live)[:, _CARD_COMBOS].sum(axis=2)
+    for card_ids in (_COMBO_IDS[:, 0], _COMBO_IDS[:, 1]):
+        card_below, card_equal = _sorted_counts(card_values.reshape(-1, _CARD_COMBOS.shape[1]), values, row_offsets * 52 + card_ids, _CARD_COMBOS.shape[1])
+        below -= card_below - card_dead[:, card_ids]
+        equal -= card_equal
+        live_count = live_count - (_CARD_COMBOS.shape[1] - card_dead[:, card_ids])
+    equal += 1
+    live_count += 1
+
+    strengths = np.where(live, (below + equal / 2) / np.maximum(live_count, 1), 0.0)
+    return strengths, live
+
+def _sorted_counts(rows: np.ndarray, queries: np.ndarray, query_rows: np.ndarray, row_length: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Counts, for each query, the values below and equal to it within a row of values. Every row is sorted and searched at once by offsetting the rows into disjoint ranges.
+
+    Args:
+        rows (np.ndarray): Rows of hand values (below 8192) of shape (number of rows, row_length).
+        queries (np.ndarray): The values to count against.
+        query_rows (np.ndarray): The row of each query, broadcastable to the shape of queries.
+        row_length (int): The length of each row.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The number of values below and equal to each query, in the shape of queries.
+    """
+    flat = (np.sort(rows, axis=1) + np.arange(len(rows), dtype=np.int64)[:, None] * 8192).ravel()
+    keys = queries + query_rows * 8192
+    left, right = np.searchsorted(flat, keys, "left"), np.searchsorted(flat, keys, "right")
+    return left - query_rows * row_length, right - left
+
+def _board_features(board_ids: list[int], runouts: int, n_bins: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Describes every pair of hole cards on a board by the distribution of its river hand strength, enumerating the runouts when there are at most runouts of them and sampling them otherwise.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The cumulative strength histograms of shape (1326, n_bins), the mean strengths and whether each pair is live on the board.
+    """
+    board_cards = [cards_manager._CARDS[card_id] for card_id in board_ids]
+    board_mask = cards_manager.cards_to_mask(board_cards)
+    holes_live = (_COMBO_MASKS & board_mask) == 0
+    needed = 5 - len(board_ids)
+    remaining = [card_id for card_id in range(52) if not board_mask >> card_id & 1]
+
+    if math.comb(len(remaining), needed) <= runouts:
+        drawn = list(combinations(remaining, needed))
+        drawn = np.array(drawn, dtype=np.int8).reshape(len(drawn), needed)
+    else:
+        drawn, _ = batch_manager.deal_batch(board_cards, runouts, 0, needed, rng)
+
+    histograms = np.zeros((bucket_manager.HOLE_PAIRS, n_bins), dtype=np.int64)
+    totals, counts = np.zeros(bucket_manager.HOLE_PAIRS), np.zeros(bucket_manager.HOLE_PAIRS, dtype=np.int64)
+    wanted = holes_live
+    while True:
+        for start in range(0, len(drawn), 32):
+            chunk = drawn[start:start + 32]
+            boards = np.concatenate([np.tile(np.array(board_ids, dtype=np.int8), (len(chunk), 1)), chunk], axis=1)
+            strengths, live = _river_strengths(boards)
+            live &= wanted[None, :]
+            rows, pairs = np.nonzero(live)
+            values = strengths[rows, pairs]
+            np.add.at(histograms, (pairs, np.minimum((values * n_bins).astype(np.int64), n_bins - 1)), 1)
+            np.add.at(totals, pairs, values)
+            np.add.at(counts, pairs, 1)
+
+        # Sampled runouts can miss a pair by always holding one of its cards, so such pairs get runouts of their own.
+        wanted = holes_live & (counts == 0)
+        if not wanted.any(): break
+        drawn, _ = batch_manager.deal_batch(board_cards, 32, 0, needed, rng)
+
+    counts = np.maximum(counts, 1)
+    return np.cumsum(histograms, axis=1) / counts[:, None], totals / counts, holes_live
+
+def _kmeans(features: np.ndarray, k: int, rng: np.random.Generator, iterations: int = 30) -> np.ndarray:
+    """Clusters feature rows with k-means++ initialisation and Lloyd iterations, returning the centres."""
+    centres = [features[rng.integers(len(features))]]
+    distances = ((features - centres[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        probabilities = distances / distances.sum() if distances.sum() > 0 else None
+        centres.append(features[rng.choice(len(features), p=probabilities)])
+        distances = np.minimum(distances, ((features - centres[-1]) ** 2).sum(axis=1))
+    centres = np.array(centres)
+
+    for _ in range(iterations):
+        labels = _nearest(features, centres)
+        for index in range(k):
+            members = features[labels == index]
+            if len(members): centres[index] = members.mean(axis=0)
+    return centres
+
+def _nearest(features: np.ndarray, centres: np.ndarray, chunk_size: int = 1 << 16) -> np.ndarray:
+    """Finds the nearest centre of each feature row."""
+    labels = np.empty(len(features), dtype=np.int64)
+    for start in range(0, len(features), chunk_size):
+        chunk = features[start:start + chunk_size]
+        labels[start:start + chunk_size] = ((chunk[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    return labels
+
+def generate_bucket_table(board_size: int, path: str = None, n_buckets: int = 16, method: str = None, runouts: int = 64, n_bins: int = 8, fit_samples: int = 200000, seed: int = 0, verbose: bool = True) -> None:
+    """
+    Clusters every holding of a street into strength buckets and writes them as a bucket table.
+
+    Args:
+        board_size (int): The number of board cards of the street (0, 3, 4 or 5).
+        path (str, optional): The path to write the table to. Defaults to None, using bucket_manager.bucket_table_path.
+        n_buckets (int, optional): The number of buckets, between 1 and 254. Defaults to 16.
+        method (str, optional): 'equity' or 'histogram'. Defaults to None, using 'equity' on the river (where every strength is exact) and 'histogram' otherwise.
+        runouts (int, optional): The number of runouts per board, enumerated when there are no more than this. Defaults to 64.
+        n_bins (int, optional): The number of strength histogram bins. Defaults to 8.
+        fit_samples (int, optional): The number of holdings the k-means centres are fitted on. Defaults to 200000.
+        seed (int, optional): The seed of the random generator, for reproducible tables. Defaults to 0.
+        verbose (bool, optional): If True, prints the progress. Defaults to True.
+
+    Raises:
+        ValueError: If the street, number of buckets or method is invalid.
+    """
+    if board_size not in bucket_manager.STREETS: raise ValueError("The number of board cards must be 0, 3, 4 or 5.")
+    if n_buckets not in range(1, bucket_manager.NO_BUCKET): raise ValueError(f"The number of buckets must be between 1 and {bucket_manager.NO_BUCKET - 1}.")
+    method = ("equity" if board_size == 5 else "histogram") if method is None else method
+    if method not in ("equity", "histogram"): raise ValueError("The method must be 'equity' or 'histogram'.")
+    path = bucket_manager.bucket_table_path(board_size) if path is None else path
+    rng = np.random.default_rng(seed)
+
+    keys = canonical_boards(board_size)
+    features = np.zeros((len(keys), bucket_manager.HOLE_PAIRS, n_bins), dtype=np.uint8) if method == "histogram" else None
+    means = np.zeros((len(keys), bucket_manager.HOLE_PAIRS), dtype=np.float32)
+    live = np.zeros((len(keys), bucket_manager.HOLE_PAIRS), dtype=bool)
+    if board_size == 5:
+        # River boards have a single runout, so they are evaluated in batches instead of one by one.
+        for start in range(0, len(keys), 32):
+            boards = np.array([_board_ids(key) for key in keys[start:start + 32]], dtype=np.int8)
+            strengths, live[start:start + 32] = _river_strengths(boards)
+            means[start:start + 32] = strengths
+            if features is not None: features[start:start + 32] = 255 * (np.arange(n_bins) >= np.minimum((strengths * n_bins).astype(np.int64), n_bins - 1)[:, :, None])
+    else:
+        for row, key in enumerate(keys):
+            histograms, means[row], live[row] = _board_features(_board_ids(key), runouts, n_bins, rng)
+            if features is not None: features[row] = np.round(histograms * 255)
+            if verbose and (row + 1) % max(1, len(keys) // 100) == 0: print(f"{bucket_manager.STREETS[board_size]}: {row + 1}/{len(keys)} boards", file=sys.stderr)
+
+    if method == "equity":
+        thresholds = np.quantile(means[live], np.arange(1, n_buckets) / n_buckets)
+        labels = np.searchsorted(thresholds, means[live], "right")
+    else:
+        rows = features[live].astype(np.float32) / 255
+        fit = rows[rng.choice(len(rows), min(fit_samples, len(rows)), replace=False)]
+        centres = _kmeans(fit, min(n_buckets, len(np.unique(fit, axis=0))), rng)
+        labels = _nearest(rows, centres)
+        # Buckets are renumbered by the mean strength of their holdings, so higher buckets are stronger.
+        strength = np.array([means[live][labels == index].mean() if (labels == index).any() else -1.0 for index in range(len(centres))])
+        labels = np.argsort(np.argsort(strength))[labels]
+
+    table = np.full((len(keys), bucket_manager.HOLE_PAIRS), bucket_manager.NO_BUCKET, dtype=np.uint8)
+    table[live] = labels
+    with open(path, "wb") as file:
+        file.write(bucket_manager.BUCKET_TABLE_HEADER.pack(bucket_manager.BUCKET_TABLE_MAGIC, 1, board_size, n_buckets, len(keys)))
+        file.write(np.array(keys, dtype="<u8").tobytes())
+        file.write(table.tobytes())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the card-abstraction bucket table of a street used by bucket_manager.bucket.")
+    parser.add_argument("--street", required=True, choices=["preflop", "flop", "turn", "river"], help="street to generate the table of")
+    parser.add_argument("--buckets", type=int, default=16, help="number of buckets")
+    parser.add_argument("--method", choices=["equity", "histogram"], default=None, help="clustering method (defaults to 'equity' on the river and 'histogram' otherwise)")
+    parser.add_argument("--runouts", type=int, default=64, help="runouts per board, enumerated when there are no more than this")
+    parser.add_argument("--bins", type=int, default=8, help="number of strength histogram bins")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    parser.add_argument("--output", default=None, help="path to write the table to (defaults to buckets_<street>.bin next to bucket_manager)")
+    args = parser.parse_args()
+    board_size = {name: size for size, name in bucket_manager.STREETS.items()}[args.street]
+    generate_bucket_table(board_size, args.output, args.buckets, args.method, args.runouts, args.bins, seed=args.seed)
@@ -0,0 +1,42 @@
+"""
+Tool generating the preflop equity table used by cards_manager.preflop_equity.
+
+Usage: python generate_equity_tables.py [--samples 20000] [--max-opponents 9] [--seed 0] [--output preflop_equity.bin]
+"""
+
+import argparse, struct
+import numpy as np
+import batch_manager, cards_manager
+
+def generate_preflop_table(path: str = cards_manager.PREFLOP_TABLE_PATH, samples: int = 20000, max_opponents: int = 9, seed: int = 0, verbose: bool = True) -> None:
+    """
+    Calculates the equity of each of the 169 preflop holdings against 1 to max_opponents random opponents with Monte Carlo sampling evaluated as arrays by batch_manager.equity_batch, and writes them as a binary table.
+    The table holds a header followed by little-endian float32 equities, ordered by holding index and then by number of opponents.
+    
+    Args:
+        path (str, optional): The path to write the table to. Defaults to cards_manager.PREFLOP_TABLE_PATH.
+        samples (int, optional): The number of samples per holding and number of opponents. Defaults to 20000.
+        max_opponents (int, optional): The largest number of opponents covered. Defaults to 9.
+        seed (int, optional): The seed each holding and number of opponents derives its random generator from, so the table is reproducible. Defaults to 0.
+        verbose (bool, optional): If True, prints the equities as they are calculated. Defaults to True.
+    """
+    equities = []
+    
+    for index in range(169):
+        name, hole_cards = cards_manager.preflop_holding(index)
+        row = [batch_manager.equity_batch(hole_cards, n_opponents=n_opponents, n_samples=samples, rng=np.random.default_rng([seed, index, n_opponents]))["equity"] for n_opponents in range(1, max_opponents + 1)]
+        equities += row
+        if verbose: print(f"{name}: {', '.join(f'{value:.3f}' for value in row)}")
+        
+    with open(path, "wb") as file:
+        file.write(cards_manager.PREFLOP_TABLE_HEADER.pack(cards_manager.PREFLOP_TABLE_MAGIC, 1, 169, max_opponents))
+        file.write(struct.pack(f"<{len(equities)}f", *equities))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the preflop equity table used by cards_manager.preflop_equity.")
+    parser.add_argument("--samples", type=int, default=20000, help="samples per holding and number of opponents")
+    parser.add_argument("--max-opponents", type=int, default=9, help="largest number of opponents covered")
+    parser.add_argument("--seed", type=int, default=0, help="seed the random generators are derived from")
+    parser.add_argument("--output", default=cards_manager.PREFLOP_TABLE_PATH, help="path to write the table to")
+    args = parser.parse_args()
+    generate_preflop_table(args.output, args.samples, args.max_opponents, args.seed)
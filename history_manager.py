@@ -0,0 +1,404 @@
+"""
+Module containing a compact append-only binary hand-history format, with a recorder for game_manager.Game, a streaming reader and a replay engine.
+
+A log starts with the magic bytes and format version, followed by one record per event. Every record starts with a type byte:
+    GAME      buy in cost (varint), player count (byte), then per player the name length (byte), UTF-8 name and starting balance (varint), then the 2 hole card ids of each player (bytes).
+    BOARD     card count (byte), then the card ids (bytes).
+    ACTION    the type byte holds ACTION_BASE plus the action kind, followed by the seat (byte) and, for raises, the amount (zigzag varint).
+    SHOWDOWN  pot (varint), result count (byte), then the position and seat of each remaining player (bytes).
+Most actions therefore take 2 bytes. Records are buffered and written once a game ends, so a log only ever holds whole games.
+"""
+
+import cards_manager, game_manager
+from collections import deque
+
+HISTORY_MAGIC = b"PKHH"
+HISTORY_VERSION = 1
+
+GAME, BOARD, SHOWDOWN = 1, 2, 3
+ACTION_BASE = 0x10
+
+BUY_IN, DECLINE, CHECK, MATCH, RAISE, FOLD, INVALID, ERROR = range(8)
+ACTION_NAMES = ("buy_in", "decline", "check", "match", "raise", "fold", "invalid", "error")
+_BET_KINDS = {"check": CHECK, "match": MATCH, "fold": FOLD}
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    """Appends a non-negative integer as an unsigned LEB128 varint."""
+    while value > 0x7F:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def _zigzag(value: int) -> int:
+    """Maps a signed integer onto a non-negative one, keeping small magnitudes small."""
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+def _unzigzag(value: int) -> int:
+    """Reverses _zigzag."""
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+def encode_buy_in(response: any) -> int:
+    """
+    Classifies a response to on_confirm_buy_in the way Game interprets it.
+
+    Args:
+        response (any): The response of the hook.
+
+    Returns:
+        int: The action kind, BUY_IN, DECLINE or INVALID.
+    """
+    if response == True: return BUY_IN
+    if response == False: return DECLINE
+    return INVALID
+
+def encode_bet(response: any) -> tuple[int, int]:
+    """
+    Classifies a response to on_betting_round the way Game interprets it.
+
+    Args:
+        response (any): The response of the hook.
+
+    Returns:
+        tuple[int, int]: The action kind and the raise amount (0 unless the kind is RAISE).
+    """
+    if isinstance(response, int): return RAISE, int(response)
+    if isinstance(response, str) and response in _BET_KINDS: return _BET_KINDS[response], 0
+    return INVALID, 0
+
+def action_response(kind: int, amount: int = 0) -> any:
+    """
+    Returns a response that Game interprets the same way as the recorded action.
+
+    Args:
+        kind (int): The action kind.
+        amount (int, optional): The raise amount. Defaults to 0.
+
+    Raises:
+        ValueError: If the kind is ERROR, which has no response as the hook failed.
+
+    Returns:
+        any: The response.
+    """
+    if kind == ERROR: raise ValueError("Failed hooks have no response.")
+    return (True, False, "check", "match", amount, "fold", None)[kind]
+
+class HistoryRecorder:
+    """Records games to an append-only binary log. Pass it to game_manager.Game as the recorder."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens the log for appending, writing the header if the file is new.
+
+        Args:
+            path (str): The path of the log.
+        """
+        self.path = path
+        self._file = open(path, "ab")
+        if self._file.tell() == 0: self._file.write(HISTORY_MAGIC + bytes((HISTORY_VERSION,)))
+        self._buffer = bytearray()
+        self._seats: dict[game_manager.Player, int] = {}
+
+    def start_game(self, buy_in_cost: int, players: list[game_manager.Player]) -> None:
+        """Records the start of a game: the buy in cost, the players and their hole cards."""
+        buffer = self._buffer
+        buffer.append(GAME)
+        _write_varint(buffer, buy_in_cost)
+        buffer.append(len(players))
+        for player in players:
+            name = player.name.encode()
+            buffer.append(len(name))
+            buffer += name
+            _write_varint(buffer, player.balance)
+        for player in players:
+            buffer += bytes(card.id for card in player.hand)
+        self._seats = {player: seat for seat, player in enumerate(players)}
+
+    def board(self, cards: list[cards_manager.Card]) -> None:
+        """Records board cards being dealt."""
+        self._buffer.append(BOARD)
+        self._buffer.append(len(cards))
+        self._buffer += bytes(card.id for card in cards)
+
+    def _action(self, player: game_manager.Player, kind: int, amount: int = 0) -> None:
+        """Records an action of a player."""
+        self._buffer.append(ACTION_BASE + kind)
+        self._buffer.append(self._seats[player])
+        if kind == RAISE: _write_varint(self._buffer, _zigzag(amount))
+
+    def buy_in(self, player: game_manager.Player, response: any) -> None:
+        """Records a response to on_confirm_buy_in."""
+        self._action(player, encode_buy_in(response))
+
+    def bet(self, player: game_manager.Player, response: any) -> None:
+        """Records a response to on_betting_round."""
+        self._action(player, *encode_bet(response))
+
+    def error(self, player: game_manager.Player) -> None:
+        """Records a hook of a player failing, raising or timing out."""
+        self._action(player, ERROR)
+
+    def showdown(self, pot: int, winner: any) -> None:
+        """Records the end of a game, as stored in Game.winner, and writes the game to the log."""
+        if isinstance(winner, game_manager.Player): results = [(1, self._seats[winner])]
+        else: results = [(position, self._seats[player]) for position, player in winner or []]
+
+        buffer = self._buffer
+        buffer.append(SHOWDOWN)
+        _write_varint(buffer, pot)
+        buffer.append(len(results))
+        for position, seat in results:
+            buffer.append(position)
+            buffer.append(seat)
+        self._file.write(buffer)
+        buffer.clear()
+
+    def flush(self) -> None:
+        """Flushes the written games to disk."""
+        self._file.flush()
+
+    def close(self) -> None:
+        """Closes the log, discarding a game that has not ended."""
+        self._buffer.clear()
+        self._file.close()
+
+    def __enter__(self) -> "HistoryRecorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class _Truncated(Exception):
+    """Raised internally when a record continues past the end of the buffered data."""
+
+def read_events(path: str, chunk_size: int = 1 << 16):
+    """
+    Streams the records of a log as tuples, reading it in chunks so memory use does not grow with the file.
+
+    Args:
+        path (str): The path of the log.
+        chunk_size (int, optional): The number of bytes read at once. Defaults to 65536.
+
+    Raises:
+        ValueError: If the file is not a hand-history log or ends in the middle of a record.
+
+    Yields:
+        tuple: (GAME, buy_in_cost, players, hands) with players a list of (name, balance) and hands a list of card id pairs, (BOARD, card_ids), (ACTION_BASE + kind, seat, amount) or (SHOWDOWN, pot, results) with results a list of (position, seat).
+    """
+    with open(path, "rb") as file:
+        if file.read(len(HISTORY_MAGIC) + 1) != HISTORY_MAGIC + bytes((HISTORY_VERSION,)):
+            raise ValueError("The file is not a hand-history log of a supported version.")
+
+        buffer, position = b"", 0
+        while True:
+            chunk = file.read(chunk_size)
+            buffer, position = buffer[position:] + chunk, 0
+            end = len(buffer)
+
+            try:
+                while position < end:
+                    record_type = buffer[position]
+                    if record_type >= ACTION_BASE:
+                        seat = buffer[position + 1]
+                        if record_type == ACTION_BASE + RAISE:
+                            value, shift, i = 0, 0, position + 2
+                            while True:
+                                byte = buffer[i]
+                                value |= (byte & 0x7F) << shift
+                                i += 1
+                                if byte < 0x80: break
+                                shift += 7
+                            yield (record_type, seat, _unzigzag(value))
+                            position = i
+                        else:
+                            yield (record_type, seat, 0)
+                            position += 2
+                    elif record_type == BOARD:
+                        count = buffer[position + 1]
+                        if position + 2 + count > end: raise _Truncated
+                        yield (BOARD, tuple(buffer[position + 2:position + 2 + count]))
+                        position += 2 + count
+                    elif record_type == SHOWDOWN:
+                        pot, i = _read_varint(buffer, position + 1)
+                        count = buffer[i]
+                        if i + 1 + 2 * count > end: raise _Truncated
+                        results = [(buffer[j], buffer[j + 1]) for j in range(i + 1, i + 1 + 2 * count, 2)]
+                        yield (SHOWDOWN, pot, results)
+                        position = i + 1 + 2 * count
+                    elif record_type == GAME:
+                        buy_in_cost, i = _read_varint(buffer, position + 1)
+                        count, i = buffer[i], i + 1
+                        players = []
+                        for _ in range(count):
+                            length = buffer[i]
+                            if i + 1 + length > end: raise _Truncated
+                            name = buffer[i + 1:i + 1 + length].decode()
+                            balance, i = _read_varint(buffer, i + 1 + length)
+                            players.append((name, balance))
+                        if i + 2 * len(players) > end: raise _Truncated
+                        hands = [tuple(buffer[j:j + 2]) for j in range(i, i + 2 * len(players), 2)]
+                        yield (GAME, buy_in_cost, players, hands)
+                        position = i + 2 * len(players)
+                    else:
+                        raise ValueError(f"Unknown record type {record_type}.")
+            except (_Truncated, IndexError):
+                pass
+
+            if not chunk:
+                if position < end: raise ValueError("The log ends in the middle of a record.")
+                return
+
+def _read_varint(buffer: bytes, position: int) -> tuple[int, int]:
+    """Reads an unsigned varint, returning it and the position after it."""
+    value = shift = 0
+    while True:
+        byte = buffer[position]
+        value |= (byte & 0x7F) << shift
+        position += 1
+        if byte < 0x80: return value, position
+        shift += 7
+
+class GameRecord:
+    """A recorded game, as read from a log."""
+    __slots__ = ("buy_in_cost", "players", "hands", "board", "actions", "pot", "results")
+
+    def __init__(self, buy_in_cost: int, players: list[tuple[str, int]], hands: list[tuple[int, int]]) -> None:
+        self.buy_in_cost = buy_in_cost
+        self.players = players
+        self.hands = hands
+        self.board: list[int] = []
+        self.actions: list[tuple[int, int, int]] = []
+        self.pot = 0
+        self.results: list[tuple[int, int]] = []
+
+    def hand_cards(self, seat: int) -> list[cards_manager.Card]:
+        """Returns the hole cards of a seat as Card objects."""
+        return [cards_manager._CARDS[card_id] for card_id in self.hands[seat]]
+
+    def board_cards(self) -> list[cards_manager.Card]:
+        """Returns the board as Card objects."""
+        return [cards_manager._CARDS[card_id] for card_id in self.board]
+
+def iter_games(path: str, chunk_size: int = 1 << 16):
+    """
+    Streams the games of a log, holding only one game in memory at a time.
+
+    Args:
+        path (str): The path of the log.
+        chunk_size (int, optional): The number of bytes read at once. Defaults to 65536.
+
+    Yields:
+        GameRecord: Each game, with its actions stored as (seat, kind, amount).
+    """
+    record = None
+    for event in read_events(path, chunk_size):
+        event_type = event[0]
+        if event_type >= ACTION_BASE:
+            record.actions.append((event[1], event_type - ACTION_BASE, event[2]))
+        elif event_type == BOARD:
+            record.board += event[1]
+        elif event_type == GAME:
+            record = GameRecord(event[1], event[2], event[3])
+        else:
+            record.pot, record.results = event[1], event[2]
+            yield record
+
+class _ScriptedDeck(cards_manager.Deck):
+    """A deck dealing the recorded cards first when shuffled."""
+
+    def __init__(self, card_ids: list[int]) -> None:
+        super().__init__()
+        dealt = set(card_ids)
+        self._script = list(card_ids) + [card_id for card_id in cards_manager._ORDERED_IDS if card_id not in dealt]
+
+    def shuffle_cards(self) -> None:
+        self._order[self._top:] = self._script[self._top:]
+        self.is_ordered = False
+
+class _ReplayScript:
+    """Stands in for a bot script, answering with the recorded responses of one seat in order."""
+
+    def __init__(self, actions: list[tuple[int, int]]) -> None:
+        self._actions = deque(actions)
+
+    def _next(self) -> any:
+        if not self._actions: raise RuntimeError("The replay requested more decisions than were recorded.")
+        kind, amount = self._actions.popleft()
+        if kind == ERROR: raise RuntimeError("The recorded hook failed.")
+        return action_response(kind, amount)
+
+    def on_confirm_buy_in(self, **kwargs) -> any:
+        return self._next()
+
+    def on_betting_round(self, **kwargs) -> any:
+        return self._next()
+
+    def error_fold(self, message: str) -> None:
+        pass
+
+def replay_game(record: GameRecord, recorder: HistoryRecorder = None) -> game_manager.Game:
+    """
+    Re-runs a recorded game through the current engine, with every player answering as recorded and the recorded cards dealt.
+
+    Args:
+        record (GameRecord): The recorded game.
+        recorder (HistoryRecorder, optional): A recorder for the replayed game. Defaults to None.
+
+    Returns:
+        game_manager.Game: The finished game. Its outcome matches the record when the engine rules are unchanged (see game_results).
+    """
+    seat_actions = [[] for _ in record.players]
+    for seat, kind, amount in record.actions:
+        seat_actions[seat].append((kind, amount))
+
+    players = [game_manager.Player(name, balance, _ReplayScript(actions)) for (name, balance), actions in zip(record.players, seat_actions)]
+    deck = _ScriptedDeck([card_id for hand in record.hands for card_id in hand] + record.board)
+    game = game_manager.Game(players, record.buy_in_cost, deck=deck, recorder=recorder)
+    game.run_game()
+    return game
+
+def game_results(game: game_manager.Game) -> list[tuple[int, int]]:
+    """
+    Returns the outcome of a finished game in the form stored in GameRecord.results.
+
+    Args:
+        game (game_manager.Game): The finished game.
+
+    Returns:
+        list[tuple[int, int]]: The position and seat of each player remaining at the end.
+    """
+    if isinstance(game.winner, game_manager.Player): return [(1, game.players.index(game.winner))]
+    return [(position, game.players.index(player)) for position, player in game.winner or []]
+
+def replay(path: str, chunk_size: int = 1 << 16):
+    """
+    Re-runs every game of a log through the current engine.
+
+    Args:
+        path (str): The path of the log.
+        chunk_size (int, optional): The number of bytes read at once. Defaults to 65536.
+
+    Yields:
+        tuple[GameRecord, game_manager.Game, bool]: Each recorded game, its replay and whether the replayed pot and outcome match the record.
+    """
+    for record in iter_games(path, chunk_size):
+        game = replay_game(record)
+        yield record, game, game.pot == record.pot and game_results(game) == record.results
+
+def rescore(path: str, compare = cards_manager.compare_hands, chunk_size: int = 1 << 16):
+    """
+    Re-scores the showdowns of a log with a hand comparison function, without re-running the games.
+
+    Args:
+        path (str): The path of the log.
+        compare (callable, optional): A function taking the hands (hole cards plus board) as separate arguments and returning their positions, as cards_manager.compare_hands does. Defaults to cards_manager.compare_hands.
+        chunk_size (int, optional): The number of bytes read at once. Defaults to 65536.
+
+    Yields:
+        tuple[GameRecord, list[tuple[int, int]]]: Each game that reached a showdown between 2 or more players, with the new position and seat of each player, sorted by position.
+    """
+    for record in iter_games(path, chunk_size):
+        if len(record.results) < 2: continue
+        seats = sorted(seat for _, seat in record.results)
+        board = record.board_cards()
+        positions = compare(*(record.hand_cards(seat) + board for seat in seats))
+        yield record, sorted(zip(positions, seats))
@@ -0,0 +1,190 @@
+"""
+Module containing opt-in instrumentation for the engine and hand evaluation: counters, latency histograms and exporters.
+
+Instrumentation is off until enable is called. While it is off, every instrumented call site only checks that `active` is None.
+"""
+
+import json, threading, time
+
+HISTOGRAM_BUCKETS = 32
+
+class Histogram:
+    """A latency histogram with power-of-two buckets in microseconds, so recording a duration takes constant time and memory."""
+
+    def __init__(self) -> None:
+        """Initializes an empty histogram."""
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def record(self, seconds: float) -> None:
+        """
+        Records a duration. Bucket i holds durations below 2**i microseconds, and the last bucket holds everything longer.
+
+        Args:
+            seconds (float): The duration in seconds.
+        """
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min: self.min = seconds
+        if seconds > self.max: self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile from the buckets, as the upper bound of the bucket holding it (capped to the largest recorded duration).
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimated duration in seconds, or 0.0 if nothing was recorded.
+        """
+        if not self.count: return 0.0
+        target, seen = q * self.count, 0
+        for index, amount in enumerate(self.buckets):
+            seen += amount
+            if seen >= target: return min((1 << index) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        """
+        Summarizes the histogram.
+
+        Returns:
+            dict: A dictionary containing keys 'count', 'total', 'mean', 'min', 'max', 'p50', 'p90' and 'p99', with durations in seconds.
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99)
+        }
+
+class Metrics:
+    """A thread-safe set of named counters and latency histograms, reported to exporters as snapshots."""
+
+    def __init__(self) -> None:
+        """Initializes empty metrics with no exporters."""
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.exporters: list = []
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """
+        Adds to a counter, creating it if needed.
+
+        Args:
+            name (str): The name of the counter.
+            amount (int, optional): The amount added. Defaults to 1.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Records a duration in a histogram, creating it if needed.
+
+        Args:
+            name (str): The name of the histogram.
+            seconds (float): The duration in seconds.
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None: histogram = self.histograms[name] = Histogram()
+            histogram.record(seconds)
+
+    def snapshot(self) -> dict[str, any]:
+        """
+        Reports the current state of every counter and histogram.
+
+        Returns:
+            dict: A dictionary containing keys 'time' (the Unix time of the snapshot), 'counters' and 'histograms' (the summary of each, see Histogram.summary).
+        """
+        with self._lock:
+            return {
+                "time": time.time(),
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.summary() for name, histogram in self.histograms.items()}
+            }
+
+    def reset(self) -> None:
+        """Removes every counter and histogram, keeping the exporters."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def add_exporter(self, exporter) -> None:
+        """
+        Registers an exporter, called with each snapshot passed to export.
+
+        Args:
+            exporter (callable): A function taking the snapshot dictionary.
+        """
+        self.exporters.append(exporter)
+
+    def export(self) -> dict[str, any]:
+        """
+        Takes a snapshot and passes it to every exporter.
+
+        Returns:
+            dict: The snapshot.
+        """
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            exporter(snapshot)
+        return snapshot
+
+class JsonLinesExporter:
+    """An exporter appending each snapshot to a file as one line of JSON."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes the exporter.
+
+        Args:
+            path (str): The path of the file.
+        """
+        self.path = path
+
+    def __call__(self, snapshot: dict[str, any]) -> None:
+        with open(self.path, "a") as file:
+            file.write(json.dumps(snapshot) + "\n")
+
+active: Metrics = None
+
+def enable(metrics: Metrics = None) -> Metrics:
+    """
+    Turns instrumentation on, so the engine and hand evaluation record into the given metrics.
+
+    Recorded metrics:
+    - counters: 'hands_evaluated', 'rank_cache.hits', 'rank_cache.misses', 'games' and 'bot_errors'.
+    - histograms: 'rank_hand', 'compare_hands', 'street.<buy_in|flop|turn|river>', 'showdown', 'game' and '<hook>.<player name>' for each bot hook call.
+
+    Args:
+        metrics (Metrics, optional): The metrics to record into. Defaults to None, creating new metrics.
+
+    Returns:
+        Metrics: The active metrics.
+    """
+    global active
+    active = Metrics() if metrics is None else metrics
+    return active
+
+def disable() -> Metrics:
+    """
+    Turns instrumentation off.
+
+    Returns:
+        Metrics: The metrics that were active, or None.
+    """
+    global active
+    metrics, active = active, None
+    return metrics
@@ -0,0 +1,209 @@
+"""Module containing a hand range notation parser and NumPy range-vs-range equity calculations."""
+
+import math
+import numpy as np
+from itertools import combinations
+import batch_manager, cards_manager
+from cards_manager import Card, RANK_SYMBOLS, SUIT_SYMBOLS
+
+def _combo_key(first: Card, second: Card) -> tuple[Card, Card]:
+    """Orders the two cards of a combo by id, so each combo has one key."""
+    return (first, second) if first.id < second.id else (second, first)
+
+def _class_combos(high: int, low: int, kind: str) -> list[tuple[Card, Card]]:
+    """
+    Lists the combos of a starting hand class.
+
+    Args:
+        high (int): The higher value.
+        low (int): The lower value, equal to high for pairs.
+        kind (str): 's' for suited, 'o' for offsuit or '' for both (pairs always use '').
+
+    Returns:
+        list[tuple[Card, Card]]: The combos of the class.
+    """
+    if high == low: return [_combo_key(Card(a, high), Card(b, high)) for a, b in combinations(range(1, 5), 2)]
+    return [_combo_key(Card(a, high), Card(b, low)) for a in range(1, 5) for b in range(1, 5) if kind == "" or (a == b) == (kind == "s")]
+
+def _parse_class(text: str) -> tuple[int, int, str]:
+    """Parses a starting hand class such as 'AKs', 'T9o', 'QQ' or 'A5', returning the higher value, lower value and suitedness."""
+    if len(text) not in (2, 3) or text[0] not in RANK_SYMBOLS or text[1] not in RANK_SYMBOLS: raise ValueError
+    first, second, kind = RANK_SYMBOLS[text[0]], RANK_SYMBOLS[text[1]], text[2:]
+    if kind not in ("", "s", "o") or (first == second and kind): raise ValueError
+    return max(first, second), min(first, second), kind
+
+def _parse_token(token: str) -> list[tuple[Card, Card]]:
+    """Expands one comma separated part of a range, without its weight, into its combos."""
+    if len(token) == 4 and token[1] in SUIT_SYMBOLS and token[3] in SUIT_SYMBOLS:
+        if token[0] not in RANK_SYMBOLS or token[2] not in RANK_SYMBOLS: raise ValueError
+        first, second = Card(SUIT_SYMBOLS[token[1]], RANK_SYMBOLS[token[0]]), Card(SUIT_SYMBOLS[token[3]], RANK_SYMBOLS[token[2]])
+        if first == second: raise ValueError
+        return [_combo_key(first, second)]
+
+    if token.endswith("+"):
+        high, low, kind = _parse_class(token[:-1])
+        if high == low: return [combo for value in range(low, 15) for combo in _class_combos(value, value, "")]
+        return [combo for value in range(low, high) for combo in _class_combos(high, value, kind)]
+
+    if "-" in token:
+        start, end = (_parse_class(part) for part in token.split("-"))
+        if start[2] != end[2]: raise ValueError
+        if start[0] == start[1] and end[0] == end[1]:
+            return [combo for value in range(min(start[0], end[0]), max(start[0], end[0]) + 1) for combo in _class_combos(value, value, "")]
+        if start[0] == end[0] and start[0] not in (start[1], end[1]):
+            return [combo for value in range(min(start[1], end[1]), max(start[1], end[1]) + 1) for combo in _class_combos(start[0], value, start[2])]
+        gap = start[0] - start[1]
+        if gap > 0 and end[0] - end[1] == gap:
+            return [combo for high in range(min(start[0], end[0]), max(start[0], end[0]) + 1) for combo in _class_combos(high, high - gap, start[2])]
+        raise ValueError
+
+    return _class_combos(*_parse_class(token))
+
+def parse_range(text: str, dead_cards: list[Card] = None) -> dict[tuple[Card, Card], float]:
+    """
+    Expands a hand range in standard notation into its weighted combos.
+    Parts are separated by commas and may be a class ('AKs', 'AKo', 'AK', 'QQ'), a class with '+' ('QQ+' for QQ to AA, 'ATs+' for ATs to AKs), a span ('QQ-99', 'A9s-A6s', '76s-54s') or a specific combo ('AsKd').
+    Any part may end with ':weight' (e.g. 'AKo:0.5'), and a later part overrides the weight of combos listed earlier.
+
+    Args:
+        text (str): The range, e.g. 'QQ+, AKs, 76s-54s, AQo:0.5'.
+        dead_cards (list[Card], optional): Cards that cannot be held, such as board cards or known hole cards. Their combos are removed. Defaults to None.
+
+    Raises:
+        ValueError: If a part of the range is invalid or a weight is negative.
+
+    Returns:
+        dict[tuple[Card, Card], float]: The weight of each combo, keyed by its 2 cards ordered by id.
+    """
+    dead_mask = cards_manager.cards_to_mask(dead_cards or [])
+    combos = {}
+    for part in text.split(","):
+        part = part.strip()
+        if not part: continue
+        token, _, weight_text = part.partition(":")
+        try:
+            expanded = _parse_token(token.strip())
+            weight = float(weight_text) if weight_text else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid range part '{part}'.") from None
+        if weight < 0: raise ValueError(f"Invalid range part '{part}': the weight cannot be negative.")
+        for combo in expanded:
+            if not (combo[0].mask | combo[1].mask) & dead_mask: combos[combo] = weight
+    return combos
+
+def _range_arrays(hand_range: str | dict, dead_mask: int) -> tuple[list[tuple[Card, Card]], np.ndarray, np.ndarray, np.ndarray]:
+    """Converts a range into its live combos, their card ids, card masks and weights, removing dead and zero weight combos."""
+    if isinstance(hand_range, str): hand_range = parse_range(hand_range)
+    combos = [combo for combo, weight in hand_range.items() if weight > 0 and not (combo[0].mask | combo[1].mask) & dead_mask]
+    ids = np.array([[first.id, second.id] for first, second in combos], dtype=np.int8).reshape(len(combos), 2)
+    masks = np.array([first.mask | second.mask for first, second in combos], dtype=np.int64)
+    weights = np.array([hand_range[combo] for combo in combos], dtype=np.float64)
+    return combos, ids, masks, weights
+
+def _runout_strengths(ids: np.ndarray, masks: np.ndarray, boards: np.ndarray, board_masks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Evaluates every combo on every board, returning the strengths (0 where a combo shares a card with the board) and which combos are live on each board."""
+    live = (masks[None, :] & board_masks[:, None]) == 0
+    hands = np.concatenate([np.broadcast_to(ids[None], (len(boards), len(ids), 2)), np.broadcast_to(boards[:, None], (len(boards), len(ids), boards.shape[1]))], axis=2)
+    strengths = np.zeros(live.shape, dtype=np.int32)
+    strengths[live] = batch_manager.evaluate_batch(hands[live])
+    return strengths, live
+
+def range_equity(hero_range: str | dict, villain_range: str | dict, board_cards: list[Card] = None, samples: int = 1000, exact: bool = None, rng: np.random.Generator = None) -> dict[str, any]:
+    """
+    Calculates the equity of one range against another, weighting every pair of combos that share no cards by the product of their weights.
+    Each board is evaluated for all combos of both ranges at once and every combo pair is compared as an array. By default, runouts are enumerated exactly from the flop on, or before it when there are no more runouts than samples, and boards are sampled otherwise. Cards held by every live combo of a range (e.g. the hero's hole cards) are left out of the runouts.
+
+    Args:
+        hero_range (str | dict): The range of the hero, in the notation of parse_range or as returned by it.
+        villain_range (str | dict): The range of the villain, in the same form.
+        board_cards (list[Card], optional): The 0 to 5 board cards already dealt. Defaults to None, meaning no board cards.
+        samples (int, optional): The number of boards sampled when not enumerating. Defaults to 1000.
+        exact (bool, optional): True to always enumerate the runouts, False to always sample. Defaults to None, choosing by street and number of runouts.
+        rng (np.random.Generator, optional): The random generator used for sampling, for reproducible results. Defaults to None, creating a new unseeded generator.
+
+    Raises:
+        ValueError: If the board is invalid, a range is invalid, or no combos of the ranges can be held together.
+
+    Returns:
+        dict: A dictionary containing keys 'equity', 'win', 'tie' and 'loss' (for the hero), 'boards' (the number of boards evaluated), 'exact', 'std_error' and 'hand_equities' (the equity of each live hero combo).
+    """
+    board_cards = [] if board_cards is None else list(board_cards)
+    if len(board_cards) > 5: raise ValueError("There cannot be more than 5 board cards.")
+    if len(set(board_cards)) != len(board_cards): raise ValueError("The board must contain only unique cards.")
+    if samples < 1: raise ValueError("There must be at least 1 sample.")
+
+    board_mask = cards_manager.cards_to_mask(board_cards)
+    hero_combos, hero_ids, hero_masks, hero_weights = _range_arrays(hero_range, board_mask)
+    _, villain_ids, villain_masks, villain_weights = _range_arrays(villain_range, board_mask)
+    pair_weights = np.outer(hero_weights, villain_weights) * ((hero_masks[:, None] & villain_masks[None, :]) == 0)
+    if not pair_weights.any(): raise ValueError("The ranges have no compatible combos.")
+
+    board_needed = 5 - len(board_cards)
+    # A board holding a card of every live combo of either range has no weight, so those cards are dead.
+    held_mask = int(np.bitwise_and.reduce(hero_masks[pair_weights.any(axis=1)])) | int(np.bitwise_and.reduce(villain_masks[pair_weights.any(axis=0)]))
+    remaining = [card_id for card_id in range(52) if not (board_mask | held_mask) >> card_id & 1]
+    if exact is None: exact = len(board_cards) >= 3 or math.comb(len(remaining), board_needed) <= samples
+    if exact:
+        runouts = list(combinations(remaining, board_needed))
+        runouts = np.array(runouts, dtype=np.int8).reshape(len(runouts), board_needed)
+    else:
+        runouts, _ = batch_manager.deal_batch(board_cards + cards_manager.mask_to_cards(held_mask), samples, 0, board_needed, rng)
+    boards = np.concatenate([np.tile(np.array([card.id for card in board_cards], dtype=np.int8), (len(runouts), 1)), runouts], axis=1)
+    board_masks = np.bitwise_or.reduce(np.left_shift(np.int64(1), runouts.astype(np.int64)), axis=1) if board_needed else np.zeros(len(runouts), dtype=np.int64)
+
+    win, tie, total = np.zeros(len(hero_combos)), np.zeros(len(hero_combos)), np.zeros(len(hero_combos))
+    board_equities = []
+    chunk = max(1, (1 << 22) // pair_weights.size)
+    for start in range(0, len(boards), chunk):
+        stop = start + chunk
+        hero_strengths, hero_live = _runout_strengths(hero_ids, hero_masks, boards[start:stop], board_masks[start:stop])
+        villain_strengths, villain_live = _runout_strengths(villain_ids, villain_masks, boards[start:stop], board_masks[start:stop])
+        weights = pair_weights[None] * hero_live[:, :, None] * villain_live[:, None, :]
+        wins = (weights * (hero_strengths[:, :, None] > villain_strengths[:, None, :])).sum(axis=2)
+        ties = (weights * (hero_strengths[:, :, None] == villain_strengths[:, None, :])).sum(axis=2)
+        totals = weights.sum(axis=2)
+        win += wins.sum(axis=0)
+        tie += ties.sum(axis=0)
+        total += totals.sum(axis=0)
+        if not exact:
+            board_totals = totals.sum(axis=1)
+            board_equities.append((wins.sum(axis=1) + ties.sum(axis=1) / 2)[board_totals > 0] / board_totals[board_totals > 0])
+
+    weight_sum = total.sum()
+    equity = (win.sum() + tie.sum() / 2) / weight_sum
+    std_error = 0.0
+    if not exact:
+        board_equities = np.concatenate(board_equities)
+        std_error = float(board_equities.std(ddof=1) / math.sqrt(len(board_equities))) if len(board_equities) > 1 else math.inf
+    hand_equities = {combo: float((win[i] + tie[i] / 2) / total[i]) for i, combo in enumerate(hero_combos) if total[i] > 0}
+    return {
+        "equity": float(equity),
+        "win": float(win.sum() / weight_sum),
+        "tie": float(tie.sum() / weight_sum),
+        "loss": float(1 - (win.sum() + tie.sum()) / weight_sum),
+        "boards": len(boards),
+        "exact": exact,
+        "std_error": std_error,
+        "hand_equities": hand_equities
+    }
+
+def hand_vs_range_equity(hole_cards: list[Card], villain_range: str | dict, board_cards: list[Card] = None, samples: int = 1000, exact: bool = None, rng: np.random.Generator = None) -> dict[str, any]:
+    """
+    Calculates the equity of a pair of hole cards against a range, removing the villain combos that share cards with the hole cards.
+
+    Args:
+        hole_cards (list[Card]): The 2 hole cards of the hero.
+        villain_range (str | dict): The range of the villain, in the notation of parse_range or as returned by it.
+        board_cards (list[Card], optional): The 0 to 5 board cards already dealt. Defaults to None, meaning no board cards.
+        samples (int, optional): The number of boards sampled when not enumerating. Defaults to 1000.
+        exact (bool, optional): True to always enumerate the runouts, False to always sample. Defaults to None, choosing by street and number of runouts.
+        rng (np.random.Generator, optional): The random generator used for sampling. Defaults to None.
+
+    Raises:
+        ValueError: If there are not exactly 2 unique hole cards, or as in range_equity.
+
+    Returns:
+        dict: The equity of the hole cards, as returned by range_equity.
+    """
+    if len(hole_cards) != 2 or hole_cards[0] == hole_cards[1]: raise ValueError("There must be exactly 2 unique hole cards.")
+    return range_equity({_combo_key(*hole_cards): 1.0}, villain_range, board_cards, samples, exact, rng)
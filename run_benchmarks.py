@@ -0,0 +1,211 @@
+"""
+Tool benchmarking the hand evaluators, hand ranking, dealing and full games with fixed seeds, writing the results as JSON and optionally comparing them against a baseline.
+
+Usage: python run_benchmarks.py [--output results.json] [--baseline baseline.json] [--threshold 0.1] [--repeat 5] [--scale 1.0] [--seed 0] [--only evaluate_combo deck_shuffle]
+"""
+
+import argparse, contextlib, io, json, platform, random, sys, time
+import cards_manager, game_manager
+
+def _random_hands(rng: random.Random, amount: int, size: int) -> list[list[cards_manager.Card]]:
+    """Deals amount random hands of size unique cards each."""
+    return [rng.sample(cards_manager._CARDS, size) for _ in range(amount)]
+
+def _bench_evaluate_combo(rng: random.Random, scale: float) -> tuple[callable, int]:
+    """Evaluates random five-card hands with the reference evaluator, kept for comparison with the lookup evaluators."""
+    hands = _random_hands(rng, max(1, int(20000 * scale)), 5)
+    def run() -> None:
+        for hand in hands:
+            cards_manager._evaluate_combo(hand)
+    return run, len(hands)
+
+def _bench_evaluator(evaluate: callable, size: int) -> callable:
+    """Creates a benchmark evaluating random hands of size cards with one of the evaluators used by hand ranking."""
+    def bench(rng: random.Random, scale: float) -> tuple[callable, int]:
+        hands = _random_hands(rng, max(1, int(100000 * scale)), size)
+        def run() -> None:
+            for hand in hands:
+                evaluate(hand)
+        return run, len(hands)
+    return bench
+
+def _bench_evaluate_mask(rng: random.Random, scale: float) -> tuple[callable, int]:
+    """Evaluates the bitmasks of random seven-card hands."""
+    masks = [cards_manager.cards_to_mask(hand) for hand in _random_hands(rng, max(1, int(100000 * scale)), 7)]
+    def run() -> None:
+        for mask in masks:
+            cards_manager.evaluate_mask(mask)
+    return run, len(masks)
+
+def _bench_evaluate_batch(rng: random.Random, scale: float) -> tuple[callable, int]:
+    """Evaluates an array of random seven-card hands with batch_manager, which requires NumPy."""
+    import batch_manager
+    card_ids = batch_manager.cards_to_ids(_random_hands(rng, max(1, int(200000 * scale)), 7))
+    def run() -> None:
+        batch_manager.evaluate_batch(card_ids)
+    return run, len(card_ids)
+
+def _bench_rank_hand(known: int, amount: int) -> callable:
+    """Creates a benchmark ranking random hands of known cards."""
+    def bench(rng: random.Random, scale: float) -> tuple[callable, int]:
+        hands = _random_hands(rng, max(1, int(amount * scale)), known)
+        def run() -> None:
+            for hand in hands:
+                cards_manager.rank_hand(hand)
+        return run, len(hands)
+    return bench
+
+def _bench_compare_hands(players: int) -> callable:
+    """Creates a benchmark comparing the hands of a table of players sharing a random board."""
+    def bench(rng: random.Random, scale: float) -> tuple[callable, int]:
+        tables = []
+        for _ in range(max(1, int(2000 * scale))):
+            cards = rng.sample(cards_manager._CARDS, 5 + 2 * players)
+            tables.append([cards[5 + 2 * i:7 + 2 * i] + cards[:5] for i in range(players)])
+        def run() -> None:
+            for hands in tables:
+                cards_manager.compare_hands(*hands)
+        return run, len(tables)
+    return bench
+
+def _bench_deck_shuffle(rng: random.Random, scale: float) -> tuple[callable, int]:
+    """Resets and shuffles a deck."""
+    deck, amount = cards_manager.Deck(rng=rng), max(1, int(20000 * scale))
+    def run() -> None:
+        for _ in range(amount):
+            deck.reset()
+            deck.shuffle_cards()
+    return run, amount
+
+def _bench_deck_draw(rng: random.Random, scale: float) -> tuple[callable, int]:
+    """Resets a deck and deals the hole cards of 6 players and a full board from it."""
+    deck, amount = cards_manager.Deck(rng=rng), max(1, int(20000 * scale))
+    def run() -> None:
+        for _ in range(amount):
+            deck.reset()
+            for _ in range(6):
+                deck.draw_cards(2)
+            deck.draw_cards(3)
+            deck.draw_cards(1)
+            deck.draw_cards(1)
+    return run, amount
+
+def _bench_run_game(rng: random.Random, scale: float) -> tuple[callable, int]:
+    """Plays full games between 4 demo_player scripts, whose decisions call rank_hand."""
+    deck, amount = cards_manager.Deck(rng=rng), max(1, int(200 * scale))
+    def run() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(amount):
+                players = [game_manager.Player(f"Player {i}", 1000, "demo_player") for i in range(1, 5)]
+                game_manager.Game(players, 1, deck=deck).run_game()
+    return run, amount
+
+BENCHMARKS = {
+    "evaluate_combo": _bench_evaluate_combo,
+    "evaluate5": _bench_evaluator(cards_manager.evaluate5, 5),
+    "evaluate7": _bench_evaluator(cards_manager.evaluate7, 7),
+    "evaluate_mask": _bench_evaluate_mask,
+    "evaluate_batch": _bench_evaluate_batch,
+    "rank_hand_2": _bench_rank_hand(2, 20),
+    "rank_hand_5": _bench_rank_hand(5, 20000),
+    "rank_hand_6": _bench_rank_hand(6, 20000),
+    "rank_hand_7": _bench_rank_hand(7, 20000),
+    "compare_hands_2": _bench_compare_hands(2),
+    "compare_hands_4": _bench_compare_hands(4),
+    "compare_hands_6": _bench_compare_hands(6),
+    "compare_hands_9": _bench_compare_hands(9),
+    "deck_shuffle": _bench_deck_shuffle,
+    "deck_draw": _bench_deck_draw,
+    "run_game": _bench_run_game
+}
+
+def run_benchmarks(names: list[str] = None, repeat: int = 5, scale: float = 1.0, seed: int = 0, verbose: bool = True) -> dict[str, any]:
+    """
+    Runs benchmarks, each with inputs generated from a fixed seed so every run measures the same work.
+    Each benchmark is run once to warm up, then timed repeat times, keeping the fastest run. rank_cache is disabled for all benchmarks except run_game, which starts from an empty cache.
+
+    Args:
+        names (list[str], optional): The names of the benchmarks to run. Defaults to None, running all of BENCHMARKS.
+        repeat (int, optional): The number of timed runs of each benchmark. Defaults to 5.
+        scale (float, optional): A factor applied to the amount of work of each benchmark. Defaults to 1.0.
+        seed (int, optional): The seed the inputs and random decisions are derived from. Defaults to 0.
+        verbose (bool, optional): If True, prints each result as it is measured. Defaults to True.
+
+    Raises:
+        ValueError: If a benchmark name does not exist or repeat is below 1.
+
+    Returns:
+        dict: A dictionary containing keys 'meta' (the Python version, platform and settings) and 'results', holding for each benchmark the keys 'ops', 'seconds', 'ops_per_second' and 'us_per_op'.
+    """
+    names = list(BENCHMARKS) if names is None else names
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown: raise ValueError(f"Unknown benchmarks: {', '.join(unknown)}.")
+    if repeat < 1: raise ValueError("There must be at least 1 timed run.")
+
+    results = {}
+    cache_enabled = cards_manager.rank_cache.enabled
+    try:
+        for name in names:
+            random.seed(f"{seed}:{name}")
+            cards_manager.rank_cache.clear()
+            cards_manager.rank_cache.enabled = name == "run_game"
+            run, ops = BENCHMARKS[name](random.Random(f"{seed}:{name}"), scale)
+            run()
+
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+
+            results[name] = {"ops": ops, "seconds": best, "ops_per_second": ops / best, "us_per_op": best / ops * 1e6}
+            if verbose: print(f"{name:<18} {ops / best:>14,.1f} ops/s {best / ops * 1e6:>12.2f} us/op", file=sys.stderr)
+    finally:
+        cards_manager.rank_cache.enabled = cache_enabled
+        cards_manager.rank_cache.clear()
+
+    meta = {"python": platform.python_version(), "implementation": platform.python_implementation(), "platform": platform.platform(), "repeat": repeat, "scale": scale, "seed": seed}
+    return {"meta": meta, "results": results}
+
+def compare_to_baseline(results: dict[str, any], baseline: dict[str, any], threshold: float = 0.1) -> dict[str, dict[str, any]]:
+    """
+    Compares benchmark results against a baseline run, flagging benchmarks that slowed down by more than the threshold.
+
+    Args:
+        results (dict): The results, as returned by run_benchmarks.
+        baseline (dict): The baseline results, in the same format.
+        threshold (float, optional): The relative slowdown tolerated before a benchmark is flagged, e.g. 0.1 for 10%. Defaults to 0.1.
+
+    Returns:
+        dict: For each benchmark present in both runs, a dictionary containing keys 'baseline' and 'current' (the ops per second of each), 'ratio' (current over baseline) and 'regression'.
+    """
+    comparison = {}
+    for name, result in results["results"].items():
+        if name not in baseline["results"]: continue
+        base, current = baseline["results"][name]["ops_per_second"], result["ops_per_second"]
+        comparison[name] = {"baseline": base, "current": current, "ratio": current / base, "regression": current / base < 1 - threshold}
+    return comparison
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the evaluator, hand ranking, dealing and full games, and print the results as JSON.")
+    parser.add_argument("--output", default=None, help="path to write the JSON results to (printed when omitted)")
+    parser.add_argument("--baseline", default=None, help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown flagged as a regression")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs of each benchmark, keeping the fastest")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor applied to the work of each benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="seed the inputs are derived from")
+    parser.add_argument("--only", nargs="+", default=None, choices=list(BENCHMARKS), help="benchmarks to run")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only, args.repeat, args.scale, args.seed)
+    if args.output is None: print(json.dumps(results, indent=4))
+    else:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            comparison = compare_to_baseline(results, json.load(file), args.threshold)
+        for name, entry in comparison.items():
+            print(f"{name:<18} {entry['ratio']:>7.2f}x{'  REGRESSION' if entry['regression'] else ''}", file=sys.stderr)
+        sys.exit(1 if any(entry["regression"] for entry in comparison.values()) else 0)
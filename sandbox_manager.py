@@ -0,0 +1,221 @@
+"""
+Module containing utilities for running bot scripts in pooled worker processes with per-decision time and memory budgets.
+
+The memory budget is enforced with resource.RLIMIT_AS, counted on top of the address space a worker holds when it starts (including what it inherits from the engine process when forked).
+The address space is read from /proc, so the memory budget is only enforced on Linux. Elsewhere (e.g. Windows or macOS) only the time budget applies.
+"""
+
+import atexit, importlib, multiprocessing, threading
+import cards_manager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_TIME_LIMIT = 1.0
+DEFAULT_MEMORY_LIMIT = 512 * 2**20
+DEFAULT_START_LIMIT = 30.0
+
+class BudgetExceededError(Exception):
+    """Raised when a sandboxed bot exceeds its time or memory budget during a decision."""
+
+def _address_space() -> int:
+    """Reads the current address space of the process in bytes from /proc, or returns None where it is not available."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _worker_main(script_path: str, connection, memory_limit: int) -> None:
+    """
+    Runs in the worker process: imports the bot script once, signals that it is ready, then answers hook calls until the connection closes.
+
+    Args:
+        script_path (str): The module path of the bot script.
+        connection (Connection): The worker's end of the pipe.
+        memory_limit (int): The memory budget of the bot in bytes, added to the address space of the worker before the script is imported, or None for no limit.
+    """
+    address_space = _address_space() if memory_limit is not None and resource is not None else None
+    if address_space is not None:
+        limit, hard_limit = address_space + memory_limit, resource.getrlimit(resource.RLIMIT_AS)[1]
+        if hard_limit != resource.RLIM_INFINITY: limit = min(limit, hard_limit)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    try:
+        script, import_error = importlib.import_module(script_path), None
+    except MemoryError:
+        script, import_error = None, MemoryError(f"Importing the bot script exceeded the memory limit of {memory_limit} bytes.")
+    except Exception as e:
+        script, import_error = None, e
+    connection.send(("ready", None))
+
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        if request is None: return
+
+        hook_name, args, kwargs, card_keys = request
+        for key in card_keys:
+            kwargs[key] = [cards_manager._CARDS[card_id] for card_id in kwargs[key]]
+
+        try:
+            if isinstance(import_error, MemoryError): raise import_error
+            if script is None: raise ImportError(f"Bot script could not be imported because: {import_error or type(import_error).__name__}")
+            connection.send(("ok", getattr(script, hook_name)(*args, **kwargs)))
+        except MemoryError as e:
+            connection.send(("memory", str(e) if script is None else f"Decision exceeded the memory limit of {memory_limit} bytes."))
+        except Exception as e:
+            connection.send(("error", str(e)))
+
+class BotWorker:
+    """A worker process hosting one bot script, restarted whenever a decision has to be abandoned."""
+
+    def __init__(self, script_path: str, memory_limit: int = DEFAULT_MEMORY_LIMIT, start_limit: float = DEFAULT_START_LIMIT) -> None:
+        """
+        Initializes the worker. The process is started by start, or on the first call.
+
+        Args:
+            script_path (str): The module path of the bot script.
+            memory_limit (int, optional): The memory budget of the bot in bytes, on top of the address space of the started worker, or None for no limit. Defaults to DEFAULT_MEMORY_LIMIT.
+            start_limit (float, optional): The maximum number of seconds to wait for the process to start and import the script, or None for no limit. Defaults to DEFAULT_START_LIMIT.
+        """
+        self.script_path = script_path
+        self.memory_limit = memory_limit
+        self.start_limit = start_limit
+        self._process = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        """Starts the worker process and waits until it has imported the script, so start up is not counted against a decision."""
+        self._connection, worker_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_worker_main, args=(self.script_path, worker_connection, self.memory_limit), daemon=True)
+        self._process.start()
+        worker_connection.close()
+        if not self._connection.poll(self.start_limit):
+            self.stop()
+            raise BudgetExceededError(f"Bot process did not start within {self.start_limit} seconds.")
+        try:
+            self._connection.recv()
+        except EOFError:
+            self.stop()
+            raise BudgetExceededError("Bot process exited while starting.")
+
+    def start(self) -> None:
+        """
+        Starts the worker process if it is not running, waiting until the script is imported.
+
+        Raises:
+            BudgetExceededError: If the process does not start within start_limit seconds or exits while starting.
+        """
+        with self._lock:
+            if self._process is None or not self._process.is_alive():
+                self.stop()
+                self._start()
+
+    def stop(self) -> None:
+        """Kills the worker process, if running."""
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._connection.close()
+            self._process = self._connection = None
+
+    def call(self, hook_name: str, args: tuple, kwargs: dict, time_limit: float) -> any:
+        """
+        Calls a hook of the bot script in the worker process. Lists of cards are sent as card ids.
+
+        Args:
+            hook_name (str): The name of the hook, e.g. 'on_betting_round'.
+            args (tuple): The positional arguments of the hook.
+            kwargs (dict): The keyword arguments of the hook.
+            time_limit (float): The maximum number of seconds to wait for the response, or None for no limit.
+
+        Raises:
+            BudgetExceededError: If the decision exceeds the time or memory budget, or the worker process dies or fails to start.
+            RuntimeError: If the hook raised an exception.
+
+        Returns:
+            any: The response of the hook.
+        """
+        card_keys = [key for key, value in kwargs.items() if isinstance(value, list) and value and all(isinstance(card, cards_manager.Card) for card in value)]
+        kwargs = {**kwargs, **{key: bytes(card.id for card in kwargs[key]) for key in card_keys}}
+
+        with self._lock:
+            if self._process is None or not self._process.is_alive():
+                self.stop()
+                self._start()
+
+            self._connection.send((hook_name, args, kwargs, card_keys))
+            if not self._connection.poll(time_limit):
+                self.stop()
+                raise BudgetExceededError(f"Decision exceeded the time limit of {time_limit} seconds.")
+            try:
+                status, value = self._connection.recv()
+            except EOFError:
+                self.stop()
+                raise BudgetExceededError("Bot process exited during the decision.")
+
+        if status == "ok": return value
+        if status == "memory": raise BudgetExceededError(value)
+        raise RuntimeError(value)
+
+_workers: dict[tuple[str, int], BotWorker] = {}
+_workers_lock = threading.Lock()
+
+def get_worker(script_path: str, memory_limit: int = DEFAULT_MEMORY_LIMIT) -> BotWorker:
+    """
+    Returns the pooled worker for a bot script, creating it if needed. Workers are shared by every player using the same script and memory limit, and reused across games.
+
+    Args:
+        script_path (str): The module path of the bot script.
+        memory_limit (int, optional): The memory budget of the bot in bytes, on top of the address space of the started worker, or None for no limit. Defaults to DEFAULT_MEMORY_LIMIT.
+
+    Returns:
+        BotWorker: The worker hosting the script.
+    """
+    with _workers_lock:
+        key = (script_path, memory_limit)
+        if key not in _workers: _workers[key] = BotWorker(script_path, memory_limit)
+        return _workers[key]
+
+@atexit.register
+def shutdown_workers() -> None:
+    """Stops every pooled worker process."""
+    with _workers_lock:
+        for worker in _workers.values():
+            worker.stop()
+        _workers.clear()
+
+class SandboxedScript:
+    """Stands in for an imported bot script, forwarding its hooks to a pooled worker process with a time budget for each call."""
+
+    def __init__(self, script_path: str, time_limit: float = DEFAULT_TIME_LIMIT, memory_limit: int = DEFAULT_MEMORY_LIMIT) -> None:
+        """
+        Initializes the script and starts its worker process, so the import of the script is not counted against the first decision.
+
+        Args:
+            script_path (str): The module path of the bot script.
+            time_limit (float, optional): The maximum number of seconds for each call, or None for no limit. Defaults to DEFAULT_TIME_LIMIT.
+            memory_limit (int, optional): The memory budget of the bot in bytes, on top of the address space of the started worker, or None for no limit (only enforced on Linux). Defaults to DEFAULT_MEMORY_LIMIT.
+        """
+        self.script_path = script_path
+        self.time_limit = time_limit
+        self.worker = get_worker(script_path, memory_limit)
+        try:
+            self.worker.start()
+        except BudgetExceededError:
+            pass  # The first call restarts the worker and reports the failure, folding the player.
+
+    def on_confirm_buy_in(self, **kwargs) -> any:
+        return self.worker.call("on_confirm_buy_in", (), kwargs, self.time_limit)
+
+    def on_betting_round(self, **kwargs) -> any:
+        return self.worker.call("on_betting_round", (), kwargs, self.time_limit)
+
+    def error_fold(self, message: str) -> any:
+        return self.worker.call("error_fold", (message,), {}, self.time_limit)
@@ -0,0 +1,110 @@
+"""
+Module containing a headless runner playing many games of game_manager.Game across a process pool and aggregating the results.
+
+Usage: python simulation_manager.py --games 10000 --scripts demo_player demo_player demo_player demo_player [--balance 1000] [--buy-in 1] [--processes 4] [--chunk-size 250] [--seed 0]
+"""
+
+import argparse, contextlib, io, json, random
+from concurrent.futures import ProcessPoolExecutor
+import game_manager, cards_manager
+
+def _run_chunk(lineup: list[tuple[str, int, str]], buy_in_cost: int, n_games: int, seed: str, quiet: bool) -> dict[str, any]:
+    """
+    Plays a chunk of games in the current process, seeding the random generator from the chunk so results do not depend on which worker runs it.
+
+    Args:
+        lineup (list[tuple[str, int, str]]): The name, starting balance and script path of each player.
+        buy_in_cost (int): The buy in cost of each game.
+        n_games (int): The number of games to play.
+        seed (str): The seed of the chunk.
+        quiet (bool): If True, output printed by the engine and the scripts is discarded.
+
+    Returns:
+        dict: The totals of the chunk, with keys 'games', 'pot', 'wins', 'chip_deltas' and 'folds' (the last three listed per player).
+    """
+    random.seed(seed)
+    deck = cards_manager.Deck()
+    totals = {"games": n_games, "pot": 0, "wins": [0.0] * len(lineup), "chip_deltas": [0.0] * len(lineup), "folds": [0] * len(lineup)}
+
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        for _ in range(n_games):
+            players = [game_manager.Player(name, balance, script_path) for name, balance, script_path in lineup]
+            game = game_manager.Game(players, buy_in_cost, deck=deck)
+            result = game.run_game()
+
+            if isinstance(result, game_manager.Player): winners = [result]
+            elif result: winners = [player for position, player in result if position == 1]
+            else: winners = []
+
+            totals["pot"] += game.pot
+            for index, player in enumerate(players):
+                share = 1 / len(winners) if player in winners else 0.0
+                totals["wins"][index] += share
+                totals["chip_deltas"][index] += player.balance - lineup[index][1] + share * game.pot
+                totals["folds"][index] += player.folded
+
+    return totals
+
+def run_simulation(lineup: list[tuple[str, int, str]], n_games: int, buy_in_cost: int = 1, processes: int = None, chunk_size: int = 250, seed: int = 0, quiet: bool = True) -> dict[str, any]:
+    """
+    Plays many independent games with the same lineup across a process pool and aggregates the results.
+    Games are dispatched in chunks, each seeded from the seed and its chunk index, so the results are identical for a fixed seed regardless of the number of processes.
+
+    Args:
+        lineup (list[tuple[str, int, str]]): The name, starting balance and script path of each player.
+        n_games (int): The number of games to play.
+        buy_in_cost (int, optional): The buy in cost of each game. Defaults to 1.
+        processes (int, optional): The number of worker processes. Use 1 to play in the current process. Defaults to None, using one per CPU core.
+        chunk_size (int, optional): The number of games sent to a worker at once. Defaults to 250.
+        seed (int, optional): The seed the chunk seeds are derived from. Defaults to 0.
+        quiet (bool, optional): If True, output printed by the engine and the scripts is discarded. Defaults to True.
+
+    Raises:
+        ValueError: If the lineup is empty or the amount of games or chunk size is invalid.
+
+    Returns:
+        dict: A dictionary containing keys 'games', 'mean_pot' and 'players', a list holding for each player the keys 'name', 'wins', 'win_rate', 'chip_delta', 'mean_chip_delta', 'folds' and 'fold_rate'. Wins are shared between tied winners and chip deltas include the pot share won.
+    """
+    if not lineup: raise ValueError("The lineup must contain at least 1 player.")
+    if n_games < 1: raise ValueError("The amount of games must be above 0.")
+    if chunk_size < 1: raise ValueError("The chunk size must be above 0.")
+
+    chunk_sizes = [min(chunk_size, n_games - start) for start in range(0, n_games, chunk_size)]
+    arguments = [(lineup, buy_in_cost, size, f"{seed}:{index}", quiet) for index, size in enumerate(chunk_sizes)]
+
+    if processes == 1:
+        chunks = [_run_chunk(*chunk_arguments) for chunk_arguments in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            chunks = list(executor.map(_run_chunk, *zip(*arguments)))
+
+    totals = {"pot": 0, "wins": [0.0] * len(lineup), "chip_deltas": [0.0] * len(lineup), "folds": [0] * len(lineup)}
+    for chunk in chunks:
+        totals["pot"] += chunk["pot"]
+        for key in ("wins", "chip_deltas", "folds"):
+            totals[key] = [total + value for total, value in zip(totals[key], chunk[key])]
+
+    players = [{
+        "name": name,
+        "wins": totals["wins"][index],
+        "win_rate": totals["wins"][index] / n_games,
+        "chip_delta": totals["chip_deltas"][index],
+        "mean_chip_delta": totals["chip_deltas"][index] / n_games,
+        "folds": totals["folds"][index],
+        "fold_rate": totals["folds"][index] / n_games
+    } for index, (name, _, _) in enumerate(lineup)]
+    return {"games": n_games, "mean_pot": totals["pot"] / n_games, "players": players}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many headless games across a process pool and print the aggregated results as JSON.")
+    parser.add_argument("--games", type=int, required=True, help="number of games to play")
+    parser.add_argument("--scripts", nargs="+", required=True, help="script path of each player, in seating order")
+    parser.add_argument("--balance", type=int, default=1000, help="starting balance of every player")
+    parser.add_argument("--buy-in", type=int, default=1, help="buy in cost of each game")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (defaults to one per core)")
+    parser.add_argument("--chunk-size", type=int, default=250, help="games sent to a worker at once")
+    parser.add_argument("--seed", type=int, default=0, help="seed the results are derived from")
+    args = parser.parse_args()
+
+    lineup = [(f"Player {index}", args.balance, script_path) for index, script_path in enumerate(args.scripts, start=1)]
+    print(json.dumps(run_simulation(lineup, args.games, args.buy_in, args.processes, args.chunk_size, args.seed), indent=4))
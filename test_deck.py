@@ -0,0 +1,69 @@
+import random
+import cards_manager
+
+class _ListDeck:
+    """The original list-backed deck semantics: removing keeps the order, appending adds to the bottom and drawing takes from the top."""
+
+    def __init__(self, cards: list[cards_manager.Card]) -> None:
+        self.cards = list(cards)
+
+    def remove_cards(self, *args: cards_manager.Card) -> None:
+        for card in args:
+            if card in self.cards: self.cards.remove(card)
+
+    def append_cards(self, *args: cards_manager.Card) -> None:
+        for card in args:
+            if card not in self.cards: self.cards.append(card)
+
+    def draw_cards(self, amount: int) -> list[cards_manager.Card]:
+        cards = self.cards[:amount]
+        self.remove_cards(*cards)
+        return cards
+
+def test_append_after_compacting_select() -> None:
+    deck = cards_manager.Deck(rng=random.Random(0))
+    deck.shuffle_cards()
+    removed = deck.cards[1:31]
+    deck.remove_cards(*removed)
+    deck.select_random_cards(2, remove_cards=False)
+    deck.append_cards(*removed)
+
+    assert len(deck) == 52
+    assert sorted(deck._order) == list(range(52))
+    assert sorted(card.id for card in deck.cards) == list(range(52))
+
+def test_append_returns_cards_to_the_bottom() -> None:
+    deck = cards_manager.Deck()
+    drawn = deck.draw_cards(2)
+    deck.append_cards(*drawn)
+
+    assert deck.cards[-2:] == drawn
+    assert deck.draw_cards(2) == cards_manager._CARDS[2:4]
+
+def test_order_matches_list_deck() -> None:
+    rng = random.Random(0)
+    for _ in range(500):
+        deck = cards_manager.Deck(rng=random.Random(rng.random()))
+        deck.shuffle_cards()
+        reference = _ListDeck(deck.cards)
+        out = []
+        for _ in range(20):
+            action = rng.choice(("remove", "append", "draw", "select"))
+            if action == "remove" and len(reference.cards):
+                cards = rng.sample(reference.cards, rng.randint(1, min(5, len(reference.cards))))
+                deck.remove_cards(*cards)
+                reference.remove_cards(*cards)
+                out += cards
+            elif action == "append" and out:
+                cards = rng.sample(out, rng.randint(1, len(out)))
+                deck.append_cards(*cards)
+                reference.append_cards(*cards)
+                out = [card for card in out if card not in cards]
+            elif action == "draw" and len(reference.cards):
+                amount = rng.randint(1, min(5, len(reference.cards)))
+                assert deck.draw_cards(amount) == reference.draw_cards(amount)
+            elif action == "select" and len(reference.cards):
+                cards = deck.select_random_cards(rng.randint(1, min(5, len(reference.cards))))
+                reference.remove_cards(*cards)
+                out += cards
+            assert deck.cards == reference.cards